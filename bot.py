@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
 
 from random import randrange
-from selenium import webdriver
 from selenium.common.exceptions import *
 from selenium.webdriver.common.keys import Keys
 from urllib3.exceptions import MaxRetryError
-from chromedriver import Chromedriver
+from driver_manager import DriverManager
+from observer import PraiseObserver
+from fingerprint import ResultFingerprint
+from waits import AdaptiveWait
+from locators import LocatorRegistry
+from resilience import RetryPolicy, CircuitBreaker, CircuitOpenError, TransientError
+from history import parse_time_value
+from people import PeopleDirectory
+from praise_parser import split_praise_text, split_praised_names, is_truncated
 import threading
+import traceback
 import requests
+import codecs
 import time
 import os
 
@@ -15,20 +24,22 @@ import os
 class Bot(threading.Thread):
     """
     Bot contains attributes and logic for Selenium automation.
-    Attributes handle when the bot starts and stops. Chromedriver
-    class used to validate and update installed chromedriver.
+    Attributes handle when the bot starts and stops. DriverManager
+    provides driver, kept open between bot runs when possible.
     Gui reference used to check if gui is still running.
     """
 
-    def __init__(self):
+    def __init__(self, server_base=None, driver_manager=None, history=None, people=None, lease=None,
+                 snapshot_dir=None):
         threading.Thread.__init__(self)
 
         # Bot settings
         # Initial page loaded by driver is Teams search page
         self._initial_page = "https://teams.microsoft.com/_#/apps/a2da8768-95d5-419e-9441-3b539865b118/search?q="
 
-        # Url of web server containing PHP scripts
-        self._server_base = "http://boxofmarkers.com/tools/praise/"
+        # Url of web server containing PHP scripts. Can be replaced
+        # with url of a local server started using server.py
+        self._server_base = server_base or "http://boxofmarkers.com/tools/praise/"
 
         # Name of server owner. Will be used to find secret key
         self._server_owner = "Mark Mandocdoc"
@@ -45,10 +56,44 @@ class Bot(threading.Thread):
         self._refresh_minutes_low = 7
         self._refresh_minutes_high = 10
 
-        # Implicit wait for Selenium. Driver will attempt to contact
-        # element for '_implicit_wait_seconds' amount of time until
-        # the attempt is cancelled and exception is thrown.
-        self._implicit_wait_seconds = 10
+        # Max wait for Selenium. Driver will attempt to contact
+        # element for at most '_wait_seconds' amount of time until
+        # the attempt is cancelled and exception is thrown. Each
+        # element waits less once its usual load time is learned.
+        self._wait_seconds = 10
+
+        # Asynchronous scripts fail with TimeoutException if they
+        # do not finish within '_script_timeout_seconds'.
+        self._script_timeout_seconds = 10
+
+        # Praises rendered by Teams are captured in the page by an
+        # injected MutationObserver. While waiting for the next
+        # refresh, the buffer is drained every '_observer_poll_seconds'.
+        self._observer_enabled = True
+        self._observer_poll_seconds = 5
+
+        # After a search refresh, search results are fingerprinted in
+        # a single script call. Script waits up to
+        # '_fingerprint_wait_milliseconds' for results to be rendered.
+        # If fingerprint matches previous cycle, scraping is skipped.
+        # If only new results added, only new results are scraped.
+        self._fingerprint_wait_milliseconds = 5000
+        self._result_fingerprint = []
+
+        # Retry policies per operation class. Browser policy used for
+        # element lookups that are expected to succeed eventually and
+        # for failed updates. Server policy used for web server calls.
+        self._browser_policy = RetryPolicy(attempts=8, base_seconds=1, max_seconds=15, budget_seconds=120)
+        self._server_policy = RetryPolicy(attempts=4, base_seconds=1, max_seconds=8, budget_seconds=30)
+
+        # Circuit breakers pause calls to a dependency that keeps
+        # failing. Server breaker pauses praise uploads. Browser
+        # breaker pauses updates after consecutive failed updates.
+        self._server_breaker = CircuitBreaker("web server", failure_threshold=5, reset_seconds=60)
+        self._browser_breaker = CircuitBreaker("browser", failure_threshold=3, reset_seconds=120)
+
+        # Web server calls fail if no response in '_server_timeout_seconds'
+        self._server_timeout_seconds = 10
 
         # String used as a password to use PHP scripts on web server.
         # Stored in web server owners private messages on Teams and
@@ -60,13 +105,63 @@ class Bot(threading.Thread):
         # gui is still running and driver still exists.
         self.gui = None
 
-        # Chromedriver object contains logic to check current
-        # version and download new version if outdated
-        self.chromedriver = None
+        # Driver manager starts chromedriver and Chrome, and keeps
+        # driver open after bot stops so next bot run can reuse it
+        self.driver_manager = driver_manager or DriverManager()
 
         # Selenium driver to run automation
         self.driver = None
 
+        # Explicit waits used to find elements on page
+        self.waits = None
+
+        # Registry of ranked locator strategies of each element
+        self.locators = None
+
+        # Observer object used to drain praises captured in page
+        self.observer = None
+
+        # Local praise history. Praises added to database appended.
+        # None if history not enabled.
+        self.history = history
+
+        # Directory of full names. Names resolved to the same full
+        # name before praise added so each person counted once.
+        self.people = people or PeopleDirectory()
+
+        # Lease shared with other Praise Counter instances. Only
+        # leader scrapes. None if only one instance is expected.
+        self.lease = lease
+
+        # Page source saved to 'snapshot_dir' when update fails or
+        # praises cannot be uploaded, so praises can be recovered
+        # later using praise_parser.py. None if not saved. At most
+        # '_snapshot_limit' snapshots kept, oldest removed first.
+        self.snapshot_dir = snapshot_dir
+        self._snapshot_limit = 200
+
+    def wait_for_sign_in(self):
+        """
+        Wait until user signs in to Teams using bot Chrome window.
+        No time limit, sign in may need multi-factor authentication.
+        Secret key lookups start once Teams has loaded.
+        """
+        self.gui.log("Teams sign in required. Sign in using bot Chrome window.\n")
+        self.gui.update_progress_label("Waiting for Teams sign in")
+        while self.gui.is_running:
+            try:
+                if self.driver_manager.profile.wait_for_teams(self.driver, 5) is False:
+                    break
+            except WebDriverException:
+                self.gui.log("Error: Chrome closed before Teams sign in.\n")
+                return
+            # Sign in page returns at once, check again shortly
+            time.sleep(2)
+        else:
+            return
+        self.driver_manager.signed_out = False
+        self.gui.log("Teams sign in complete.\n")
+
     def init_secret_key(self):
         """
         Initialize secret key. Secret key is used to allow access
@@ -74,16 +169,25 @@ class Bot(threading.Thread):
         updating or adding to database. Secret key is found in
         private message of web server owner using #secret_key keyword.
         Refer to READ_ME for more information regarding setup.
+        Lookups retried using browser retry policy.
         """
+        retry = 0
+        started = time.time()
+
         while self.gui.is_running:
             try:
-                search_input_field = self.driver.find_element_by_xpath("//input[@id='searchInputField']")
+                search_input_field = self.locators.find("search_input")
                 search_input_field.clear()
                 search_input_field.send_keys('#secret_key')
                 search_input_field.send_keys(Keys.ENTER)
             except NoSuchElementException:
-                self.gui.log("Error: Search bar not found. Retrying in 1 second ...\n")
-                time.sleep(1)
+                delay = self._browser_policy.next_delay(retry, started)
+                retry += 1
+                if delay is None:
+                    self.gui.log("Error: Secret key initialization failed. Search bar not found.\n")
+                    return
+                self.gui.log("Error: Search bar not found. Retrying in {:.1f} seconds ...\n".format(delay))
+                time.sleep(delay)
                 continue
             except AttributeError:
                 self.gui.log("Error: Secret key initialization failed. Element not found.\n")
@@ -93,18 +197,24 @@ class Bot(threading.Thread):
                 return
             break
 
+        retry = 0
+        started = time.time()
+
         while self.gui.is_running:
             try:
                 if not self.gui.log("Initializing secret key ... "):
                     return
-                search_result_text = self.driver.find_element_by_xpath(
-                    "//div[@class='search-content']//span[contains(text(),'" + self._server_owner + "')]"
-                    "/../..//div[contains(@class,'search-chat-body')]").text
+                search_result_text = self.locators.find("secret_key_result", owner=self._server_owner).text
                 self._secret_key = search_result_text.split("#secret_key:")[1]
             except NoSuchElementException:
                 self.gui.log("failure\n", False)
-                self.gui.log("Error: Secret key not found. Retrying in 1 second ...\n")
-                time.sleep(1)
+                delay = self._browser_policy.next_delay(retry, started)
+                retry += 1
+                if delay is None:
+                    self.gui.log("Error: Secret key not found.\n")
+                    return
+                self.gui.log("Error: Secret key not found. Retrying in {:.1f} seconds ...\n".format(delay))
+                time.sleep(delay)
                 continue
             except AttributeError:
                 self.gui.log("failure\n", False)
@@ -124,31 +234,26 @@ class Bot(threading.Thread):
 
     def verify_praise(self, praiser_name, praised_name, praise_text):
         """
-        Verify valid praise clicked on search panel. Uses xpath and
-        input parameters to validate the clicked search result is
-        a valid praise. Will not find xpath if praise invalid.
+        Verify valid praise clicked on search panel. Uses praise card
+        locator and input parameters to validate the clicked search
+        result is a valid praise. Will not find card if praise invalid.
+        Praise card waited for using learned timeout, so results that
+        are not praise cards rejected quickly.
         :param praiser_name: string name of praiser
         :param praised_name: string name of praised
         :param praise_text: string partial sub string of praise
             text. Will be used to differentiate with other praises
-        :return: boolean True if valid praise and False if invalid
+        :return: praise card element if valid praise, None if invalid
         """
         try:
-            self.driver.find_element_by_xpath(
-                "//div[@class='card-body']//div[@class='ac-container']//div[@class='ac-textBlock'][1]"
-                "/p[contains(text(), '{}')]/../../div[3]"
-                "/p[contains(text(), '{}')]/../../div"
-                "//p[contains(text(), '{}')]/../../../../../.."
-                "//span[contains(text(),'Praise')]"
-                .format(praiser_name, praised_name, praise_text)
-            )
+            return self.locators.find(
+                "praise_card", praiser=praiser_name, praised=praised_name, text=praise_text)
         except InvalidSessionIdException:
             self.gui.log("Praise verification failed. Invalid session ID. Stopping bot.\n")
-            return False
+            return None
         except NoSuchElementException:
             self.gui.log("Invalid Praise. Moving to next search result.\n")
-            return False
-        return True
+            return None
 
     def do_add_praise(self, time_value, praiser_name, praised_name):
         """
@@ -161,15 +266,23 @@ class Bot(threading.Thread):
         :return: string web server results. Returns 1 if successful
             add to database. Returns 2 if duplicate found.
         """
-        server_base = self._server_base
         add_praise = "add_praise.php"
         parameters = "?s=" + self._secret_key + "&t=" + time_value + "&r=" + praiser_name + "&d=" + praised_name
-        r = requests.get(server_base + add_praise + parameters, headers={"User-Agent": "Chrome"})
+
+        try:
+            r = self.do_server_request(add_praise + parameters)
+        except CircuitOpenError:
+            self.gui.log("Error: Server unavailable. Praise upload skipped.\n")
+            return "0"
+        except (requests.RequestException, TransientError):
+            self.gui.log("Error: Cannot connect to server.\n")
+            return "0"
 
         if r.content == "2":
             print_text = "Duplicate Praise. Moving to next search result.\n"
         elif r.content == "1":
             print_text = "New Praise. Database has been updated.\n"
+            self.do_add_history(time_value, praiser_name, praised_name)
         elif r.status_code != 200:
             print_text = "Error: Cannot connect to server.\n"
         else:
@@ -179,6 +292,159 @@ class Bot(threading.Thread):
 
         return r.content
 
+    def do_server_request(self, script):
+        """
+        Send request to web server using server retry policy.
+        Connection errors and server errors are retried. Server
+        circuit breaker opens if web server keeps failing.
+        :param script: string script name and query parameters
+        :return: requests response
+        :raises CircuitOpenError: if server circuit breaker open
+        :raises RequestException: if connection failed after retries
+        :raises TransientError: if server error after retries
+        """
+        def request():
+            response = requests.get(
+                self._server_base + script, headers={"User-Agent": "Chrome"}, timeout=self._server_timeout_seconds)
+            if response.status_code >= 500:
+                raise TransientError("Server error {}".format(response.status_code))
+            return response
+
+        return self._server_policy.call(
+            request, retry_on=(requests.RequestException, TransientError), breaker=self._server_breaker,
+            is_running=lambda: self.gui.is_running,
+            on_retry=lambda exception, delay: self.gui.log(
+                "Error: Server request failed. Retrying in {:.1f} seconds ...\n".format(delay)))
+
+    def do_add_history(self, time_value, praiser_name, praised_name):
+        """
+        Append praise added to database to local praise history.
+        Praise time that cannot be parsed is left out, as history has
+        no original time to reconcile with server.
+        :param time_value: string time of praise
+        :param praiser_name: string first and last name of praiser
+        :param praised_name: string first and last name of praised
+        """
+        if self.history is None:
+            return
+        epoch = parse_time_value(time_value)
+        if epoch is None:
+            self.gui.log("Error: Praise time '{}' not added to local history.\n".format(time_value))
+            return
+        try:
+            self.history.append(epoch, praiser_name, praised_name)
+        except (IOError, OSError):
+            self.gui.log("Error: Praise could not be added to local history.\n")
+
+    def do_add_praises(self, time_value, praiser_name, praised_name):
+        """
+        Add praise for every praised name. Praises given to multiple
+        people list names separated by commas and are added one by one.
+        Names replaced with canonical full names from people directory.
+        :param time_value: string time of praise
+        :param praiser_name: string first and last name of praiser
+        :param praised_name: string one or more comma separated names
+        :return: string web server result of last praise added
+        """
+        # Initialize variable before loop to suppress reference warning
+        result = "0"
+
+        praiser_name = self.people.learn(self.people.canonical(praiser_name))
+
+        for name in praised_name.split(", "):
+            result = self.do_add_praise(time_value, praiser_name, self.people.learn(self.people.canonical(name)))
+
+        return result
+
+    def resolve_praised_names(self, text_value, praised_first_name):
+        """
+        Resolve names at end of search result snippet using people
+        directory, so praised names need not be read from praise card.
+        Only names cut off with ellipses are matched by prefix.
+        :param text_value: string search result snippet
+        :param praised_first_name: string first name of praised
+        :return: string comma separated full names, or None if any
+            name not known or snippet cut off
+        """
+        names = split_praised_names(text_value, praised_first_name)
+        if names is None:
+            return None
+        full_names = [self.people.resolve_truncated(name) if is_truncated(name) else self.people.resolve(name)
+                      for name in names]
+        if None in full_names:
+            return None
+        return ", ".join(full_names)
+
+    def do_save_people(self):
+        """
+        Save people directory. Failure is not fatal, names are
+        learned again from praises scraped by next run.
+        """
+        try:
+            self.people.save()
+        except (IOError, OSError):
+            self.gui.log("Error: People directory could not be saved.\n")
+
+    def init_observer(self):
+        """
+        Inject praise observer into Teams page. Observer failure is
+        not fatal, praises are still found by search refreshes.
+        """
+        if not self._observer_enabled:
+            return
+
+        self.gui.log("Initializing praise observer ... ")
+        try:
+            self.observer = PraiseObserver(self.driver)
+            self.observer.install()
+        except WebDriverException:
+            self.observer = None
+            self.gui.log("failure\n", False)
+            self.gui.log("Error: Praise observer could not be injected. Using search refresh only.\n")
+            return
+        self.gui.log("successful\n", False)
+
+    def do_drain_observer(self):
+        """
+        Add praises captured by praise observer since the last drain.
+        Duplicates are handled by web server the same way as praises
+        found by 'do_update()'.
+        :return: boolean False if observer could not be drained
+        """
+        try:
+            praises = self.observer.drain()
+        except TimeoutException:
+            # Page busy. Buffer kept in page until next drain.
+            return True
+        except WebDriverException:
+            self.gui.log("Error: Praise observer drain failed. Chrome not reachable.\n")
+            return False
+
+        for praise in praises:
+            if not self.gui.is_running:
+                break
+            praiser_name = praise["praiser"].partition(" [Marked ")[0]
+            self.gui.log(u"Praise observed: {} praised {}\n".format(praiser_name, praise["praised"]))
+            self.do_add_praises(praise["time"], praiser_name, praise["praised"])
+
+        if praises:
+            self.do_save_people()
+
+        return True
+
+    def do_mark_observed(self, praise_card):
+        """
+        Mark praise card as seen by praise observer. Failure is not
+        fatal, praise is then only uploaded again as a duplicate.
+        :param praise_card: element of praise card from verify_praise
+        """
+        if self.observer is None:
+            return
+        try:
+            self.observer.mark(praise_card)
+        except WebDriverException:
+            pass
+
     def do_update_time(self):
         """
         Update last refresh on web server. Fails if gui not running.
@@ -189,9 +455,20 @@ class Bot(threading.Thread):
         self.gui.log("Updating last refresh ... ")
         script = "update_time.php"
         parameters = "?s=" + self._secret_key
-        r = requests.get(self._server_base + script + parameters, headers={"User-Agent": "Chrome"})
+
+        # Lease renewed by same request if lease on web server
+        if self.lease is not None:
+            parameters += self.lease.piggyback_parameters()
+
+        try:
+            r = self.do_server_request(script + parameters)
+        except (CircuitOpenError, requests.RequestException, TransientError):
+            self.gui.log("failure\n", False)
+            return
         if str(r.status_code) == "200":
             self.gui.log("successful\n", False)
+            if self.lease is not None:
+                self.lease.piggyback_result(r.content)
         else:
             self.gui.log("failure\n", False)
 
@@ -204,7 +481,7 @@ class Bot(threading.Thread):
         """
         try:
             self.gui.log("Updating search results ... ")
-            search_input = self.driver.find_element_by_xpath("//input[@id='searchInputField']")
+            search_input = self.locators.find("search_input")
             search_input.clear()
             search_input.send_keys("got praise!")
             search_input.send_keys(Keys.ENTER)
@@ -223,12 +500,25 @@ class Bot(threading.Thread):
             return False
         return True
 
+    def do_fingerprint(self):
+        """
+        Fingerprint search results after refresh. Fingerprint
+        failure is not fatal, all results are checked instead.
+        :return: list of result hashes or None if script failed
+        """
+        try:
+            return ResultFingerprint(self.driver, self._fingerprint_wait_milliseconds).capture()
+        except WebDriverException:
+            self.gui.log("Error: Search results could not be fingerprinted. Checking all results.\n")
+            return None
+
     def do_update(self):
         """
         Main automation logic. Search result entries clicked starting
         from most recent and moving down until 'duplicate_threshold'
         value reached. Will attempt to add praise if verified valid.
         After 'duplicate_threshold' reached, gui status loop started.
+        If search results unchanged since last update, scraping skipped.
         :return boolean True if update completes successfully
         """
         duplicate_count = 0
@@ -236,38 +526,72 @@ class Bot(threading.Thread):
         search_result_index = 1
         search_result_max = 0
 
+        # Used to log time taken by update
+        started = time.time()
+
         # Refresh search results. If search results fail, return False.
         if not self.do_refresh():
             return
 
+        # Compare search results with results of last update.
+        # None if unknown, otherwise number of new results at top.
+        fingerprint = self.do_fingerprint()
+        new_result_count = ResultFingerprint.new_item_count(self._result_fingerprint, fingerprint)
+
+        if new_result_count == 0:
+            self.gui.log("Search results unchanged. Praise scraping skipped.\n")
+            self.log_update_duration(started, 0)
+            self.do_update_time()
+            self.schedule_refresh()
+            return True
+
+        if new_result_count is not None:
+            self.gui.log("{} new search results found.\n".format(new_result_count))
+
         # Element variables used for looping through search results
         praiser_name = ""
         text_value = ""
 
+        # Search result refreshes made after elements not reached
+        refresh_retry = 0
+        refresh_started = time.time()
+
+        # Set to False if a praise could not be uploaded
+        completed = True
+
         while self.gui.is_running:
 
+            # Stop scraping if another instance has taken over
+            if self.lease is not None and not self.lease.is_leader:
+                self.gui.log("Leader lease lost. Praise scraping stopped.\n")
+                completed = False
+                break
+
+            # Stop scraping while praises cannot be uploaded
+            if self._server_breaker.is_open():
+                self.gui.log("Error: Server unavailable. Praise scraping paused.\n")
+                completed = False
+                break
+
+            # Stop after new search results have been checked
+            if new_result_count is not None and search_result_index > new_result_count:
+                self.gui.log("New search results checked. Praise scraping stopped.\n")
+                break
+
             while self.gui.is_running:
                 try:
 
-                    search_result = self.driver.find_element_by_xpath(
-                        "//div[@class='search-content']/div[{}]/div[contains(@data-tid, 'search-content-item')]"
-                        .format(search_result_index))
+                    search_result = self.locators.find("search_result", index=search_result_index)
                     self.driver.execute_script("arguments[0].scrollIntoView();", search_result)
 
                     search_result.click()
 
-                    search_result_name = self.driver.find_element_by_xpath(
-                        "//div[@class='search-content']/div[{}]//div[contains(@class,'search-chat-entry-name-time')]"
-                        "/span[contains(@class,'user-name')]".format(search_result_index)
-                    )
+                    search_result_name = self.locators.find("search_result_name", index=search_result_index)
 
                     # Full name of praiser taken from main full panel
                     praiser_name = str(search_result_name.text)
 
-                    search_result_text = self.driver.find_element_by_xpath(
-                        "//div[@class='search-content']/div[{}]"
-                        "//div[contains(@class,'search-chat-body')]"
-                        .format(search_result_index))
+                    search_result_text = self.locators.find("search_result_text", index=search_result_index)
 
                     # UnicodeEncodeError exception found with character u'\u2019'
                     # Caused by casting search_result_text.text to string
@@ -283,8 +607,15 @@ class Bot(threading.Thread):
                     self.gui.log("Error: Praise update failed. Chrome not reachable.\n")
                     return
                 except AttributeError:
-                    if not self.gui.log("Error: Could not reach element. Refreshing search results.\n"):
+                    delay = self._browser_policy.next_delay(refresh_retry, refresh_started)
+                    refresh_retry += 1
+                    if delay is None:
+                        self.gui.log("Error: Could not reach element. Praise update failed.\n")
+                        return
+                    if not self.gui.log("Error: Could not reach element. Refreshing search results in "
+                                        "{:.1f} seconds.\n".format(delay)):
                         return
+                    time.sleep(delay)
                     if not self.do_refresh():
                         return
                     continue
@@ -298,34 +629,26 @@ class Bot(threading.Thread):
             # Partition used because no error thrown if pattern not found
             praiser_name = praiser_name.partition(" [Marked ")[0]
 
-            # First name found in left panel search results
-            praised_first_name = text_value.split()[0]
-
-            # Issue found with first name having ellipses
-            # Need to check for ellipses and remove if exists
-            praised_first_name = praised_first_name.partition("...")[0]
-
-            # Praise text value after "got praise!" string
-            text_value = text_value.split(" got praise! ")[1]
+            # Fast rejection of search results that are not praises.
+            # No need to wait for praise card that will never load.
+            snippet = split_praise_text(text_value)
+            if snippet is None:
+                self.gui.log("Invalid Praise. Moving to next search result.\n")
+                search_result_index += 1
+                continue
 
-            text_value = text_value.split(" {}".format(praised_first_name))[0]
-            text_value_length = len(text_value)
+            # Names of everyone praised, if all known to people
+            # directory. Praise card names not read if known.
+            resolved_name = self.resolve_praised_names(text_value, snippet[0])
 
-            # Change text value length if too long or too short
-            if text_value_length >= 20:
-                text_value_length = 20
-            elif 6 <= text_value_length < 20:
-                text_value_length = text_value_length
-            elif 0 < text_value_length <= 5:
-                text_value_length = 5
-            else:
-                text_value_length = len(praised_first_name)
-
-            text_value = text_value[0:text_value_length]
+            # First name and start of praise text found in left panel
+            # search results. Used to find praise card.
+            praised_first_name, text_value = snippet
 
             # After clicking search result, verify message is a praise
             # If not, show error and continue down search results
-            if not self.verify_praise(praiser_name, praised_first_name, text_value):
+            praise_card = self.verify_praise(praiser_name, praised_first_name, text_value)
+            if praise_card is None:
                 search_result_index += 1
                 continue
 
@@ -337,25 +660,27 @@ class Bot(threading.Thread):
             # While loop to verify 'praised_name' set successfully.
             # Variable required to add praise properly to server.
             while praised_name == "":
-                # Order matters for the variables and xpath
                 # Element must end with first name to get selected name
                 try:
 
-                    selected_element = self.driver.find_element_by_xpath(
-                        "//div[@class='card-body']//div[@class='ac-container']//div[@class='ac-textBlock'][1]"
-                        "/p[contains(text(),'{}')]/../../div"
-                        "//p[contains(text(),'{}')]/../../div[3]"
-                        "/p[contains(text(),'{}')]"
-                        .format(praiser_name, text_value, praised_first_name)
-                    )
-                    praised_name = selected_element.text
-
-                    time_element = selected_element.find_element_by_xpath(
-                        "./../../../../../../../../../../../../../../../../../../../"
-                        "/div/div/div/span[@data-tid='messageTimeStamp']")
+                    time_element = None
+                    if resolved_name:
+                        try:
+                            time_element = self.locators.find("praise_time", praise_card)
+                            praised_name = resolved_name
+                        except NoSuchElementException:
+                            # Read names from praise card instead
+                            resolved_name = None
+
+                    if time_element is None:
+                        selected_element = self.locators.find(
+                            "praised_name", praiser=praiser_name, text=text_value, praised=praised_first_name)
+                        praised_name = selected_element.text
+                        time_element = self.locators.find("praise_time", selected_element)
+
                     time_value = time_element.get_attribute("title")
 
-                    search_count_element = self.driver.find_elements_by_xpath("//div[@ng-repeat='item in sc.result']")
+                    search_count_element = self.locators.find_all("search_results")
                     search_result_max = len(search_count_element)
 
                 except NoSuchWindowException:
@@ -372,16 +697,15 @@ class Bot(threading.Thread):
             if not self.gui.is_running:
                 return
 
-            # Initialize variable before if statements to suppress reference warning
-            result = "0"
+            # Card rendered by clicking result not uploaded again by drain
+            self.do_mark_observed(praise_card)
 
             # Split any praises that have multiple names
-            if "," in praised_name:
-                praised_names = str(praised_name).split(", ")
-                for name in praised_names:
-                    result = self.do_add_praise(time_value, praiser_name, name)
-            else:
-                result = self.do_add_praise(time_value, praiser_name, praised_name)
+            result = self.do_add_praises(time_value, praiser_name, praised_name)
+
+            # Result None while upload pending on pipelined engine
+            if result is not None and result not in ("1", "2"):
+                completed = False
 
             # Increase duplicate count by 1 if duplicate
             if result == "2":
@@ -400,9 +724,64 @@ class Bot(threading.Thread):
 
             search_result_index += 1
 
+        # Results only remembered after update completes so results
+        # missed by a failed update are checked again next update
+        if fingerprint is not None and completed:
+            self._result_fingerprint = fingerprint
+
+        # Praises not uploaded can be recovered from page later
+        if not completed:
+            self.do_save_snapshot("incomplete")
+
+        self.log_update_duration(started, search_result_index)
+
+        self.do_save_people()
+
         # Update last updated time
         self.do_update_time()
 
+        self.schedule_refresh()
+
+        return True
+
+    def do_save_snapshot(self, reason):
+        """
+        Save page source to snapshot directory. Failure is not fatal.
+        :param reason: string added to snapshot filename
+        """
+        if self.snapshot_dir is None:
+            return
+        try:
+            if not os.path.isdir(self.snapshot_dir):
+                os.makedirs(self.snapshot_dir)
+            # Snapshot names start with save time, so oldest sort first
+            snapshots = sorted(name for name in os.listdir(self.snapshot_dir) if name.endswith(".html"))
+            for name in snapshots[:max(0, len(snapshots) - self._snapshot_limit + 1)]:
+                os.remove(os.path.join(self.snapshot_dir, name))
+            path = os.path.join(
+                self.snapshot_dir, "{}-{}.html".format(time.strftime("%Y%m%d-%H%M%S"), reason))
+            page_source = self.driver.page_source
+            with codecs.open(path, "w", "utf-8") as snapshot_file:
+                snapshot_file.write(page_source)
+            self.gui.log("Page snapshot saved to {}\n".format(path))
+        except WebDriverException:
+            self.gui.log("Error: Page snapshot failed. Chrome not reachable.\n")
+        except (IOError, OSError):
+            self.gui.log("Error: Page snapshot could not be saved.\n")
+
+    def log_update_duration(self, started, search_result_count):
+        """
+        Log time taken by update. Used to compare bot engines.
+        :param started: float time update started
+        :param search_result_count: integer search results checked
+        """
+        self.gui.log("Update took {:.1f} seconds. {} search results checked.\n".format(
+            time.time() - started, search_result_count))
+
+    def schedule_refresh(self):
+        """
+        Start gui countdown until next search refresh.
+        """
         # Calculate next refresh time based on limits.
         # Random value between low and high used for countdown.
         seconds_low = self._refresh_minutes_low * 60
@@ -415,14 +794,21 @@ class Bot(threading.Thread):
         self.gui.countdown_max = num_seconds
         self.gui.start_refresh_countdown()
 
-        return True
-
     def start_bot_loop(self):
         """
         Thread loop to keep thread alive. Uses gui.is_running
         variable to decide whether or not to stop looping. Will
-        not run loop gui if secret key not initialized.
+        not run loop gui if secret key not initialized. While
+        waiting for refresh, praise observer buffer is drained.
+        Failed updates retried with backoff. After consecutive
+        failures, browser circuit breaker pauses updates. If another
+        instance holds lease, bot stands by until lease acquired.
         """
+        next_drain = time.time() + self._observer_poll_seconds
+
+        # True while another instance is leader
+        standby = False
+
         while self.gui.is_running:
             if self._secret_key == "":
                 self.gui.log("Secret key not initialized. Stopping bot thread.\n")
@@ -430,12 +816,47 @@ class Bot(threading.Thread):
             if not self.is_open():
                 self.gui.log("Chrome browser closed. Stopping bot thread.\n")
                 return
+            if self.lease is not None and self.lease.error is not None:
+                self.gui.log("Error: {}. Stopping bot thread.\n".format(self.lease.error))
+                return
+            if self.lease is not None and not self.lease.is_leader:
+                if not standby:
+                    self.gui.log("Another instance is scraping praises. Standing by.\n")
+                    self.gui.update_progress_label("Standing by for other instance")
+                    standby = True
+                time.sleep(1)
+                continue
+            if standby:
+                # Update at once after taking over from previous leader
+                self.gui.log("Leader lease acquired. Scraping praises.\n")
+                self.gui.countdown = 0
+                standby = False
             if self.gui.countdown > 0:
+                if self.observer is not None and time.time() >= next_drain:
+                    next_drain = time.time() + self._observer_poll_seconds
+                    if not self.do_drain_observer():
+                        break
                 time.sleep(1)
                 continue
-            if not self.do_update():
+            if self.do_update():
+                self._browser_breaker.success()
+                continue
+            if not self.gui.is_running:
                 break
 
+            self.do_save_snapshot("failed")
+            self._browser_breaker.failure()
+            if self._browser_breaker.is_open():
+                num_seconds = int(self._browser_breaker.remaining_seconds())
+                self.gui.log("Error: Updates keep failing. Updates paused for {} seconds.\n".format(num_seconds))
+            else:
+                num_seconds = int(self._browser_policy.delay(self._browser_breaker.failures - 1)) + 1
+                self.gui.log("Update failed. Retrying in {} seconds.\n".format(num_seconds))
+
+            self.gui.countdown = num_seconds
+            self.gui.countdown_max = num_seconds
+            self.gui.start_refresh_countdown()
+
     def is_open(self):
         """
         Check if browser open by checking if title available.
@@ -450,56 +871,98 @@ class Bot(threading.Thread):
 
     def run(self):
         """
-        Run method for bot threading object. Will remain alive
-        while gui is alive using gui.is_running variable. When
-        gui is no longer alive, run log reaches end and quits.
+        Run method for bot threading object. Unexpected errors are
+        logged and gui always informed bot stopped, so Start button
+        is not left on Stop with no bot running.
+        """
+        try:
+            self.run_bot()
+        except Exception as exception:
+            # Message may contain non-ASCII page text, so not str()
+            self.gui.log("Error: Bot stopped unexpectedly. {}".format(
+                traceback.format_exception_only(type(exception), exception)[-1]))
+        finally:
+            # Lease released so a standby instance takes over at once
+            if self.lease is not None:
+                self.lease.stop()
+
+            # Signal gui bot is stopped
+            # Changes Stop button to Start
+            self.gui.stop_bot()
+
+    def run_bot(self):
+        """
+        Run bot until gui stops it. Will remain alive while gui is
+        alive using gui.is_running variable. When gui is no longer
+        alive, run log reaches end and quits.
         """
 
         # Start bot console messages
         self.gui.update_progress_label("Initializing ...")
         self.gui.log("Starting bot ... successful\n")
-        self.gui.log("Initializing chromedriver ... ")
 
-        # Initialize chromedriver object
-        # Will download required chromedriver
-        self.chromedriver = Chromedriver()
+        # Warm driver from previous bot run skips chromedriver check,
+        # Chrome launch, Teams load and secret key initialization
+        warm = self.driver_manager.is_warm()
 
-        if not self.gui.log(str(self.chromedriver.version) + " installed\n", False):
-            return
+        if warm:
+            self.gui.log("Resuming open Chrome session ... successful\n")
+        else:
+            self.gui.log("Initializing chromedriver ... ")
 
-        # Initialize driver options using default profile to retain settings
-        # Settings needed for Teams access after server owner logs in
-        options = webdriver.ChromeOptions()
-        options.add_argument("user-data-dir=" + os.getenv("LOCALAPPDATA") + "\\Google\\Chrome\\User Data")
-        options.add_argument("user-profile=Default")
+            # Will download required chromedriver
+            self.driver_manager.start_service()
+
+            if not self.gui.log(str(self.driver_manager.chromedriver.version) + " installed\n", False):
+                return
 
         # Initialize driver. If Chrome browser already open, catch
         # InvalidArgumentException and write error to log
         try:
-            self.driver = webdriver.Chrome(self.chromedriver.filepath, chrome_options=options)
-            self.driver.get(self._initial_page)
+            self.driver = self.driver_manager.acquire(self._initial_page)
         except InvalidArgumentException:
-            self.gui.log("Error: Close all Chrome browsers and restart application\n")
-            self.gui.stop_bot()
+            self.gui.log("Error: Bot Chrome profile in use. Close bot Chrome window and restart application\n")
             return
         except SessionNotCreatedException:
             self.gui.log("Error: Session not created. Driver failed to initialize\n")
-            self.gui.stop_bot()
             return
 
+        # Sign in state could not be copied from user's Chrome profile
+        if self.driver_manager.signed_out:
+            self.wait_for_sign_in()
+
         # Check if gui running in case closed before setting value
         if self.gui.is_running:
-            self.driver.implicitly_wait(self._implicit_wait_seconds)
+            # Implicit wait disabled. Explicit waits used instead so
+            # lookups expected to fail do not wait full timeout.
+            self.driver.implicitly_wait(0)
+            self.waits = AdaptiveWait(self.driver, self._wait_seconds)
+            self.locators = LocatorRegistry(self.driver, self.waits)
+            self.driver.set_script_timeout(self._script_timeout_seconds)
         else:
             return
 
         # Init secret key needs to be performed before refresh.
-        self.init_secret_key()
+        # Secret key found by previous bot run reused if warm.
+        if warm and self.driver_manager.secret_key:
+            self._secret_key = self.driver_manager.secret_key
+            self.gui.secret_key_initialized = True
+        else:
+            self.init_secret_key()
+            self.driver_manager.secret_key = self._secret_key
+
+        # Observer injected after Teams has loaded the page
+        if self.gui.is_running:
+            self.init_observer()
+
+        # Leader election needs secret key if lease on web server
+        if self.lease is not None and self.gui.is_running:
+            self.lease.bind(self._server_base, self._secret_key)
+            self.lease.start()
+            if self.lease.error is not None:
+                self.gui.log("Error: {}. Stopping bot.\n".format(self.lease.error))
+                return
 
         # Start update process. Gui loop starts after secret key init.
         # Gui loop keeps run thread alive. Ends when gui not running.
         self.start_bot_loop()
-
-        # Signal gui bot is stopped
-        # Changes Stop button to Start
-        self.gui.stop_bot()
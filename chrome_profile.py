@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.common.by import By
+import shutil
+import glob
+import os
+
+
+class ChromeProfile(object):
+    """
+    ChromeProfile manages a dedicated Chrome profile used by the
+    bot. Only the files holding Teams sign in state are copied from
+    the user's Default profile, so the bot does not load extensions,
+    history or cache and can run while the user's Chrome is open.
+    Sign in state copied again when Teams asks the bot to sign in.
+    """
+
+    # Files and directories copied from user's Default profile.
+    # Cookies and Local Storage hold Teams tokens. IndexedDB only
+    # copied for Teams origins.
+    PROFILE_FILES = [
+        "Cookies",
+        "Cookies-journal",
+        os.path.join("Network", "Cookies"),
+        os.path.join("Network", "Cookies-journal"),
+    ]
+    PROFILE_DIRECTORIES = [
+        os.path.join("Local Storage", "leveldb"),
+    ]
+    PROFILE_PATTERNS = [
+        os.path.join("IndexedDB", "https_teams.microsoft.com_*"),
+    ]
+
+    # Local State holds key used by Chrome to decrypt cookies
+    USER_DATA_FILES = [
+        "Local State",
+    ]
+
+    # Chrome features not needed by bot. Reduces launch time and disk I/O.
+    CHROME_ARGUMENTS = [
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-extensions",
+        "--disable-sync",
+        "--disable-default-apps",
+        "--disable-component-update",
+    ]
+
+    def __init__(self, source_dir=None, user_data_dir=None):
+        local_app_data = os.getenv("LOCALAPPDATA") or ""
+
+        # User data directory of user's Chrome. Sign in state copied from here.
+        self.source_dir = source_dir or os.path.join(local_app_data, "Google", "Chrome", "User Data")
+
+        # User data directory of bot profile. Kept in local app data
+        # so it is not synced with roaming profile.
+        self.user_data_dir = user_data_dir or os.path.join(local_app_data, "PraiseCounter", "Chrome")
+
+        # Profile directory used in both user data directories
+        self.profile_name = "Default"
+
+        # Files that could not be copied during last clone, usually
+        # because user's Chrome has them locked
+        self.failed_files = []
+
+    def exists(self):
+        """
+        :return: boolean True if bot profile has been created
+        """
+        return os.path.isfile(os.path.join(self.user_data_dir, "Local State"))
+
+    def copy_file(self, source, target):
+        """
+        Copy file if missing or older than source.
+        :param source: string filepath of file in user's profile
+        :param target: string filepath of file in bot profile
+        """
+        if not os.path.isfile(source):
+            return
+        if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return
+        if not os.path.isdir(os.path.dirname(target)):
+            os.makedirs(os.path.dirname(target))
+        try:
+            shutil.copy2(source, target)
+        except (IOError, OSError):
+            # File locked by user's Chrome. Previous copy kept.
+            self.failed_files.append(source)
+
+    def copy_directory(self, source, target):
+        """
+        Copy files in directory that are missing or older than source.
+        :param source: string directory in user's profile
+        :param target: string directory in bot profile
+        """
+        for root, directories, filenames in os.walk(source):
+            relative = os.path.relpath(root, source)
+            for filename in filenames:
+                self.copy_file(os.path.join(root, filename), os.path.normpath(os.path.join(target, relative, filename)))
+
+    def clone(self):
+        """
+        Copy sign in state from user's Chrome profile to bot profile.
+        Only changed files copied.
+        :return: boolean True if all files copied
+        """
+        self.failed_files = []
+        source_profile = os.path.join(self.source_dir, self.profile_name)
+        target_profile = os.path.join(self.user_data_dir, self.profile_name)
+
+        for filename in self.USER_DATA_FILES:
+            self.copy_file(os.path.join(self.source_dir, filename), os.path.join(self.user_data_dir, filename))
+        for filename in self.PROFILE_FILES:
+            self.copy_file(os.path.join(source_profile, filename), os.path.join(target_profile, filename))
+        for directory in self.PROFILE_DIRECTORIES:
+            self.copy_directory(os.path.join(source_profile, directory), os.path.join(target_profile, directory))
+        for pattern in self.PROFILE_PATTERNS:
+            for directory in glob.glob(os.path.join(source_profile, pattern)):
+                self.copy_directory(directory, os.path.join(target_profile, os.path.relpath(directory, source_profile)))
+
+        return not self.failed_files
+
+    def options(self):
+        """
+        :return: ChromeOptions using bot profile
+        """
+        options = webdriver.ChromeOptions()
+        options.add_argument("user-data-dir=" + self.user_data_dir)
+        options.add_argument("profile-directory=" + self.profile_name)
+        for argument in self.CHROME_ARGUMENTS:
+            options.add_argument(argument)
+        return options
+
+    @staticmethod
+    def is_signed_out(driver):
+        """
+        Check if Teams redirected driver to Microsoft sign in page.
+        :param driver: selenium driver
+        :return: boolean True if sign in required
+        """
+        url = driver.current_url
+        return "login.microsoftonline.com" in url or "login.live.com" in url
+
+    @classmethod
+    def wait_for_teams(cls, driver, timeout_seconds=30):
+        """
+        Wait for Teams to either show its search bar or redirect to
+        Microsoft sign in page. Redirect made by Teams scripts after
+        page load, so url right after load is not enough.
+        :param driver: selenium driver
+        :param timeout_seconds: float max seconds waited
+        :return: True if sign in required, False if Teams loaded,
+            None if neither happened in time
+        """
+        def settled(searched):
+            if cls.is_signed_out(searched):
+                return "signed out"
+            if searched.find_elements(By.ID, "searchInputField"):
+                return "loaded"
+            return None
+
+        try:
+            return WebDriverWait(driver, timeout_seconds, 0.5).until(settled) == "signed out"
+        except TimeoutException:
+            return None
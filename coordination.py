@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import requests
+import socket
+import errno
+import json
+import uuid
+import time
+import os
+
+
+class LeaseUnsupportedError(Exception):
+    """
+    Raised when lease store cannot hold a lease, e.g. web server
+    without lease.php.
+    """
+    pass
+
+
+class Lease(object):
+    """
+    Lease elects one Praise Counter instance as leader. Only the
+    leader scrapes, other instances stand by. Leader renews lease
+    every 'heartbeat_seconds'. If leader stops renewing, lease
+    expires after 'ttl_seconds' and a standby instance takes over.
+    Subclasses store lease in a shared file or on web server. Base
+    lease stored nowhere and always held, as when one instance runs.
+    """
+
+    def __init__(self, ttl_seconds=15, heartbeat_seconds=5):
+        # Unique name of this instance
+        self.owner = "{}-{}-{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+        # Seconds lease valid after renewal, and seconds between renewals
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+
+        # True if this instance held lease at last renewal
+        self.is_leader = False
+
+        # Reason lease cannot be used, e.g. server has no lease
+        # script. None if lease usable.
+        self.error = None
+
+        # Time of last renewal attempt
+        self._renewed = 0
+
+        # Set to end heartbeat thread
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def bind(self, server_base, secret_key):
+        """
+        Set web server details once bot has found secret key.
+        Only used by leases stored on web server.
+        """
+        pass
+
+    def try_acquire(self):
+        """
+        Acquire or renew lease.
+        :return: boolean True if this instance holds lease
+        """
+        return True
+
+    def try_release(self):
+        """
+        Give up lease if held so a standby instance takes over at once.
+        """
+        pass
+
+    def renew(self):
+        """
+        Renew lease and record result.
+        :return: boolean True if this instance is leader
+        """
+        try:
+            self.is_leader = self.try_acquire()
+        except LeaseUnsupportedError as exception:
+            self.error = str(exception)
+            self.is_leader = False
+        except (IOError, OSError, ValueError, requests.RequestException):
+            # Lease store not reachable. Cannot tell if another
+            # instance is leader, so stop scraping until reachable.
+            self.is_leader = False
+        self._renewed = time.time()
+        return self.is_leader
+
+    def piggyback_parameters(self):
+        """
+        Query parameters added to update_time.php so refresh time
+        update also renews lease. Empty if lease not on web server.
+        :return: string query parameters
+        """
+        return ""
+
+    def piggyback_result(self, content):
+        """
+        Record lease result returned by update_time.php.
+        :param content: string response content
+        """
+        pass
+
+    def heartbeat(self):
+        """
+        Renewal loop run on heartbeat thread.
+        """
+        while not self._stopped.is_set():
+            if time.time() - self._renewed >= self.heartbeat_seconds:
+                self.renew()
+            self._stopped.wait(1)
+
+    def start(self):
+        """
+        Start renewing lease in the background.
+        """
+        self._stopped.clear()
+        # Error of previous run cleared, e.g. lease script added since
+        self.error = None
+        self.renew()
+        self._thread = threading.Thread(target=self.heartbeat)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop renewing lease and release it.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            if self.is_leader:
+                self.try_release()
+        except (IOError, OSError, ValueError, requests.RequestException):
+            # Lease expires on its own after 'ttl_seconds'
+            pass
+        self.is_leader = False
+
+
+class FileLease(Lease):
+    """
+    FileLease stores lease in a JSON file on a drive shared by all
+    instances. A lock file created with O_EXCL guards each update.
+    Clocks of other machines are never compared with this one. The
+    leader counts its renewals in the lease file, and a standby
+    treats the lease as expired once the count has not changed for
+    'ttl_seconds' of its own clock. Stale lock files found the same
+    way.
+    """
+
+    # Lock file unchanged this long is left over from a crashed instance
+    stale_lock_seconds = 10
+
+    def __init__(self, path, **kwargs):
+        Lease.__init__(self, **kwargs)
+
+        # Filepath of lease file and lock file
+        self.path = path
+        self.lock_path = path + ".lock"
+
+        # Owner and renewal count last read from lease file, and
+        # local time first read
+        self._seen_lease = None
+        self._seen_lease_time = 0
+
+        # Modification time of lock file last found, and local time
+        # first found
+        self._seen_lock = None
+        self._seen_lock_time = 0
+
+    def lock(self):
+        """
+        Create lock file. Stale lock files removed.
+        :return: boolean True if lock created
+        """
+        try:
+            os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            self._seen_lock = None
+            return True
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+        try:
+            lock_mtime = os.path.getmtime(self.lock_path)
+            if lock_mtime != self._seen_lock:
+                self._seen_lock = lock_mtime
+                self._seen_lock_time = time.time()
+            elif time.time() - self._seen_lock_time > self.stale_lock_seconds:
+                os.remove(self.lock_path)
+                self._seen_lock = None
+        except OSError:
+            # Lock released or removed by another instance
+            pass
+        return False
+
+    def unlock(self):
+        os.remove(self.lock_path)
+
+    def read(self):
+        """
+        :return: dictionary with owner and renewals, empty if no lease
+        """
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path, "r") as lease_file:
+            return json.load(lease_file)
+
+    def write(self, lease):
+        with open(self.path, "w") as lease_file:
+            json.dump(lease, lease_file)
+
+    def is_expired(self, lease):
+        """
+        Check lease of another instance using local clock only.
+        :param lease: dictionary read from lease file
+        :return: boolean True if renewal count unchanged for 'ttl_seconds'
+        """
+        seen = (lease.get("owner"), lease.get("renewals"))
+        if seen != self._seen_lease:
+            self._seen_lease = seen
+            self._seen_lease_time = time.time()
+            return False
+        return time.time() - self._seen_lease_time > self.ttl_seconds
+
+    def try_acquire(self):
+        if not self.lock():
+            # Another instance updating lease. Keep current state.
+            return self.is_leader
+        try:
+            lease = self.read()
+            owner = lease.get("owner")
+            if owner not in (None, self.owner) and not self.is_expired(lease):
+                return False
+            renewals = lease.get("renewals", 0) + 1 if owner == self.owner else 0
+            self.write({"owner": self.owner, "renewals": renewals})
+            return True
+        finally:
+            self.unlock()
+
+    def try_release(self):
+        if not self.lock():
+            return
+        try:
+            if self.read().get("owner") == self.owner:
+                self.write({})
+        finally:
+            self.unlock()
+
+
+class ServerLease(Lease):
+    """
+    ServerLease stores lease on web server using lease.php.
+    Refresh time updates carry lease renewal as well.
+    """
+
+    def __init__(self, **kwargs):
+        Lease.__init__(self, **kwargs)
+
+        # Set by bind once secret key found
+        self.server_base = None
+        self.secret_key = ""
+
+        # Seconds to wait for web server
+        self.timeout_seconds = 5
+
+    def bind(self, server_base, secret_key):
+        self.server_base = server_base
+        self.secret_key = secret_key
+
+    def request(self, ttl_seconds):
+        """
+        Send lease request to web server.
+        :param ttl_seconds: integer lease length, 0 releases lease
+        :return: boolean True if this instance holds lease
+        """
+        if self.server_base is None:
+            return False
+        r = requests.get(
+            self.server_base + "lease.php",
+            params={"s": self.secret_key, "o": self.owner, "l": ttl_seconds},
+            headers={"User-Agent": "Chrome"}, timeout=self.timeout_seconds)
+        if r.status_code == 404:
+            raise LeaseUnsupportedError(
+                "Server {} does not support leases. Use a local server or a lease file".format(self.server_base))
+        return r.status_code == 200 and r.content == "1"
+
+    def try_acquire(self):
+        return self.request(self.ttl_seconds)
+
+    def try_release(self):
+        self.request(0)
+
+    def piggyback_parameters(self):
+        return "&o=" + self.owner + "&l=" + str(self.ttl_seconds)
+
+    def piggyback_result(self, content):
+        self.is_leader = content == "1"
+        self._renewed = time.time()
+
+
+def create_lease(lease_option):
+    """
+    Create lease from command line option.
+    :param lease_option: "server" for web server lease, filepath
+        of shared lease file, or None if coordination not used
+    :return: Lease or None
+    """
+    if not lease_option:
+        return None
+    if lease_option == "server":
+        return ServerLease()
+    return FileLease(lease_option)
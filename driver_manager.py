@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from chrome_profile import ChromeProfile
+from chromedriver import Chromedriver
+
+
+class DriverManager(object):
+    """
+    DriverManager keeps chromedriver service and a logged in Chrome
+    session alive between bot runs. When bot stops, driver is
+    released instead of closed. Next bot run reuses driver after a
+    health check, skipping chromedriver check, Chrome launch, Teams
+    load and secret key lookup. Driver closed on application exit.
+    """
+
+    def __init__(self, on_service_started=None):
+        # Chromedriver object contains logic to check current
+        # version and download new version if outdated
+        self.chromedriver = None
+
+        # Chromedriver service. Kept running while Chrome restarted.
+        self.service = None
+
+        # Selenium driver shared by bot runs
+        self.driver = None
+
+        # Secret key found by first bot run using current driver
+        self.secret_key = ""
+
+        # Dedicated Chrome profile holding Teams sign in state
+        self.profile = ChromeProfile()
+
+        # True if Teams still asked to sign in after sign in state
+        # copied again. User needs to sign in using bot window.
+        self.signed_out = False
+
+        # True while a bot is using driver
+        self._leased = False
+
+        # Function given process id of chromedriver service when
+        # started, so Chrome can be killed if engine is killed
+        self._on_service_started = on_service_started
+
+    def is_healthy(self):
+        """
+        Check driver is alive and still showing Teams.
+        :return: boolean True if driver can be reused
+        """
+        if self.driver is None:
+            return False
+        try:
+            return bool(self.driver.window_handles) and \
+                self.driver.current_url.startswith("https://teams.microsoft.com")
+        except Exception:
+            # Chrome closed, crashed, or chromedriver not reachable
+            return False
+
+    def is_warm(self):
+        """
+        :return: boolean True if a healthy driver is waiting for a bot
+        """
+        return not self._leased and self.is_healthy()
+
+    def start_service(self):
+        """
+        Start chromedriver service if not running. Chromedriver
+        downloaded if missing or wrong version for installed Chrome.
+        """
+        if self.service is not None and self.service.process is not None and self.service.process.poll() is None:
+            return
+        self.chromedriver = Chromedriver()
+        self.service = Service(self.chromedriver.filepath)
+        self.service.start()
+        if self._on_service_started is not None:
+            self._on_service_started(self.service.process.pid)
+
+    def launch(self, initial_page):
+        """
+        Launch Chrome using running chromedriver service. Bot
+        profile created from user's profile on first launch. If
+        Teams asks to sign in, sign in state copied again from
+        user's profile and Chrome relaunched once.
+        :param initial_page: string url loaded after launch
+        """
+        if not self.profile.exists():
+            self.profile.clone()
+
+        self.start_driver(initial_page)
+        self.signed_out = bool(self.profile.wait_for_teams(self.driver))
+
+        if self.signed_out:
+            # Chrome must be closed before profile files replaced
+            self.driver.quit()
+            self.profile.clone()
+            self.start_driver(initial_page)
+            self.signed_out = bool(self.profile.wait_for_teams(self.driver))
+
+    def start_driver(self, initial_page):
+        """
+        Start Chrome using bot profile and load initial page.
+        :param initial_page: string url loaded after launch
+        """
+        # Bot profile contains only Teams sign in state copied from
+        # user's Default profile. Settings needed for Teams access.
+        options = self.profile.options()
+
+        self.driver = webdriver.Remote(
+            command_executor=self.service.service_url, desired_capabilities=options.to_capabilities())
+        self.driver.get(initial_page)
+
+    def acquire(self, initial_page):
+        """
+        Get driver for a bot run. Warm driver returned if healthy,
+        otherwise Chrome is launched. Driver still leased by a
+        previous bot that did not stop is closed and replaced.
+        :param initial_page: string url loaded if Chrome launched
+        :return: selenium driver
+        """
+        if not self.is_warm():
+            self.discard()
+            self.start_service()
+            self.launch(initial_page)
+        self._leased = True
+        return self.driver
+
+    def release(self):
+        """
+        Return driver after bot run. Driver kept open for next run.
+        """
+        self._leased = False
+
+    def discard(self):
+        """
+        Close driver. Chromedriver service kept running.
+        """
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                # Chrome already closed
+                pass
+        self.driver = None
+        self.secret_key = ""
+        self._leased = False
+
+    def shutdown(self):
+        """
+        Close driver and stop chromedriver service on application exit.
+        """
+        self.discard()
+        if self.service is not None:
+            try:
+                self.service.stop()
+            except Exception:
+                # Chromedriver already ended
+                pass
+        self.service = None
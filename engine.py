@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+from Queue import Empty
+from driver_manager import DriverManager
+from history import PraiseHistory
+from people import PeopleDirectory
+from coordination import create_lease
+from pipeline import PipelinedBot
+from bot import Bot
+import multiprocessing
+import subprocess
+import time
+
+
+# Bot classes selectable using engine option. Threaded bot uploads
+# each praise before scraping next search result. Pipelined bot
+# scrapes while praises are uploaded on another thread.
+BOT_ENGINES = {
+    "threaded": Bot,
+    "pipelined": PipelinedBot,
+}
+
+
+class GuiProxy(object):
+    """
+    GuiProxy stands in for Gui inside the engine process. Bot
+    uses the same attributes and methods it would use on Gui,
+    but every call is sent to the real gui as an event message.
+    Countdown is kept locally so bot does not wait on the gui.
+    """
+
+    def __init__(self, events):
+        # Queue used to send events to gui process
+        self._events = events
+
+        # Bot checks this variable to see status. Set to False
+        # when gui sends stop or shutdown command.
+        self.is_running = True
+        self.secret_key_initialized = False
+
+        # Time countdown reaches zero. Countdown calculated from
+        # deadline so it keeps running without gui updates.
+        self._countdown_deadline = 0
+        self.countdown_max = 0
+
+        # Bot running in engine process using this proxy
+        self.bot = None
+
+        # Set after driver closed and gui informed bot stopped
+        self._stopped = False
+
+    @property
+    def countdown(self):
+        return max(0, int(round(self._countdown_deadline - time.time())))
+
+    @countdown.setter
+    def countdown(self, value):
+        self._countdown_deadline = time.time() + value
+
+    def log(self, text, timestamp=True):
+        """
+        Send text to gui console log.
+        :param text: string text to be added to gui console
+        :param timestamp: boolean is timestamp added to text
+        :return: boolean True if bot is still allowed to run
+        """
+        if not self.is_running:
+            return False
+        self._events.put(("log", text, timestamp))
+        return True
+
+    def update_progress_label(self, text):
+        """
+        Send progress label text to gui.
+        :param text: string text used for progress label
+        """
+        self._events.put(("progress_label", text))
+
+    def start_refresh_countdown(self):
+        """
+        Send countdown values to gui to start progress bar countdown.
+        """
+        self._events.put(("countdown", self.countdown, self.countdown_max))
+
+    def stop_bot(self):
+        """
+        Release driver and inform gui bot has stopped. Driver kept
+        open by driver manager for next bot run. Called by bot when
+        run ends and by engine when stop command received. Only
+        first call has any effect.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self.is_running = False
+
+        self.bot.driver_manager.release()
+        self.bot.driver = None
+
+        self._events.put(("stopped",))
+
+
+def run_engine(commands, events, bot_options):
+    """
+    Engine process main loop. Waits for gui commands and starts
+    or stops bot threads. Driver manager shared by bot threads
+    keeps Chrome open until shutdown command received.
+    :param commands: multiprocessing queue of commands from gui
+    :param events: multiprocessing queue of events sent to gui
+    :param bot_options: dictionary of keyword arguments for Bot.
+        Engine option selects bot class from BOT_ENGINES. History
+        option is directory of praise history shared by bots. Lease
+        option selects leader election used by bots.
+    """
+    bot = None
+    proxy = None
+    # Chromedriver process id sent to gui, which kills Chrome if
+    # engine process has to be killed
+    driver_manager = DriverManager(on_service_started=lambda pid: events.put(("driver_pid", pid)))
+
+    bot_options = dict(bot_options)
+    bot_class = BOT_ENGINES[bot_options.pop("engine", "threaded")]
+
+    history_dir = bot_options.pop("history_dir", None)
+    history = PraiseHistory(history_dir) if history_dir else None
+
+    # Loaded once and shared so names learned by one bot run are
+    # known by the next
+    people = PeopleDirectory()
+
+    # Same instance name kept across bot runs
+    lease = create_lease(bot_options.pop("lease", None))
+
+    while True:
+        command = commands.get()
+
+        if command == "start":
+            # Bot still running. A bot that ignored stop is left
+            # behind since its driver has already been closed.
+            if proxy is not None and proxy.is_running:
+                continue
+            proxy = GuiProxy(events)
+            bot = bot_class(driver_manager=driver_manager, history=history, people=people, lease=lease,
+                            **bot_options)
+            bot.gui = proxy
+            bot.daemon = True
+            proxy.bot = bot
+            bot.start()
+
+        elif command in ("stop", "shutdown"):
+            # Bot ends at its next gui.is_running check. If bot is
+            # stuck in a Selenium call, closing driver interrupts it.
+            if bot is not None and bot.is_alive():
+                proxy.is_running = False
+                bot.join(Engine.stop_timeout_seconds)
+                if bot.is_alive():
+                    driver_manager.discard()
+            if proxy is not None:
+                proxy.stop_bot()
+            if command == "shutdown":
+                driver_manager.shutdown()
+                if history is not None:
+                    history.close()
+                people.save()
+                return
+
+
+class Engine(object):
+    """
+    Engine runs bot in a child process. Gui sends commands and
+    receives log, progress and status events through queues. If
+    the engine process hangs or crashes it can be killed and a
+    new process is started on next start without closing gui.
+    """
+
+    # Seconds engine process waits for bot to stop before closing
+    # driver, and seconds gui waits for engine process to end
+    # before killing it
+    stop_timeout_seconds = 5
+    shutdown_timeout_seconds = 10
+
+    def __init__(self, bot_options=None):
+        # Keyword arguments used to create bot in engine process
+        self.bot_options = bot_options or {}
+
+        # Queues used to talk to engine process. Replaced when
+        # engine process killed since queues may be corrupted.
+        self.commands = None
+        self.events = None
+
+        # Engine child process
+        self.process = None
+
+        # Process id of chromedriver started by engine process. Its
+        # process tree, including Chrome, killed with engine process.
+        self.driver_pid = None
+
+        # Events read while engine process killed, not yet handled
+        self._pending_events = []
+
+    def is_alive(self):
+        """
+        :return: boolean True if engine process is running
+        """
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """
+        Start bot. Engine process started first if not running.
+        """
+        if not self.is_alive():
+            self.commands = multiprocessing.Queue()
+            self.events = multiprocessing.Queue()
+            self.driver_pid = None
+            self.process = multiprocessing.Process(
+                target=run_engine, args=(self.commands, self.events, self.bot_options))
+            self.process.daemon = True
+            self.process.start()
+        self.commands.put("start")
+
+    def stop(self):
+        """
+        Ask engine process to stop bot. Engine process kept alive.
+        """
+        if self.is_alive():
+            self.commands.put("stop")
+
+    def kill(self):
+        """
+        Terminate engine process. Used when engine does not respond.
+        Chromedriver and Chrome started by engine process killed too,
+        otherwise they keep bot profile in use and next start fails.
+        """
+        if self.is_alive():
+            # Driver process id may not have been handled by gui yet
+            self._pending_events = self.get_events()
+            self.process.terminate()
+            self.process.join()
+            if self.driver_pid is not None:
+                self.kill_process_tree(self.driver_pid)
+        self.process = None
+        self.driver_pid = None
+
+    @staticmethod
+    def kill_process_tree(pid):
+        """
+        Kill process and every process it started using taskkill.
+        :param pid: integer process id
+        """
+        try:
+            process = subprocess.Popen(
+                ["taskkill", "/F", "/T", "/PID", str(pid)],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE, shell=True
+            )
+            process.communicate()
+        except OSError:
+            # Process already ended or taskkill not available
+            pass
+
+    def shutdown(self):
+        """
+        Stop bot and end engine process. Engine process killed
+        if it does not end within 'shutdown_timeout_seconds'.
+        """
+        if not self.is_alive():
+            return
+        self.commands.put("shutdown")
+        self.process.join(self.shutdown_timeout_seconds)
+        self.kill()
+
+    def get_events(self):
+        """
+        Get all events sent by engine process without blocking.
+        :return: list of event tuples
+        """
+        events, self._pending_events = self._pending_events, []
+        if self.events is None:
+            return events
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except (Empty, IOError, EOFError):
+                return events
+            if event[0] == "driver_pid":
+                self.driver_pid = event[1]
+            events.append(event)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+
+class ResultFingerprint:
+    """
+    ResultFingerprint reads the whole search result list in one
+    asynchronous script call and reduces each result to a short
+    hash. Comparing hashes with the previous cycle tells the bot
+    whether any praise was added without clicking into results.
+    """
+
+    # Waits until the result list has been rendered again after a
+    # search refresh and has stopped changing, then returns one key
+    # per result. Captured nodes are marked so the next call can tell
+    # freshly rendered results from results left over from the last
+    # search. If results are never replaced (nothing changed and
+    # Teams reused the nodes), keys are returned when wait times out.
+    SCRIPT = """
+        var done = arguments[arguments.length - 1];
+        var timeout = arguments[0];
+        var started = new Date().getTime();
+        var last = null;
+
+        function keys(items) {
+            var result = [];
+            for (var i = 0; i < items.length; i++) {
+                var nameTime = items[i].querySelector("div.search-chat-entry-name-time");
+                var body = items[i].querySelector("div.search-chat-body");
+                result.push((nameTime ? nameTime.textContent : "") + "|" + (body ? body.textContent : ""));
+            }
+            return result;
+        }
+
+        function poll() {
+            var items = document.querySelectorAll("div.search-content > div");
+            var current = keys(items);
+            var fresh = items.length > 0 && !items[0].__praiseFingerprint;
+            var stable = last !== null && current.join("\\n") === last;
+            last = current.join("\\n");
+            if ((fresh && stable) || new Date().getTime() - started > timeout) {
+                for (var i = 0; i < items.length; i++) {
+                    items[i].__praiseFingerprint = true;
+                }
+                done(current);
+                return;
+            }
+            setTimeout(poll, 250);
+        }
+
+        poll();
+    """
+
+    def __init__(self, driver, wait_milliseconds=5000):
+        # Selenium driver used to run script
+        self.driver = driver
+
+        # Max time script waits for results to be rendered again
+        self.wait_milliseconds = wait_milliseconds
+
+    def capture(self):
+        """
+        Read search result list and hash each result.
+        :return: list of string hashes ordered newest result first
+        """
+        keys = self.driver.execute_async_script(self.SCRIPT, self.wait_milliseconds)
+        return [hashlib.md5(key.encode("utf-8")).hexdigest() for key in keys]
+
+    @staticmethod
+    def new_item_count(previous, current):
+        """
+        Count results added to the top of the list since the
+        previous fingerprint was captured.
+        :param previous: list of hashes from previous cycle
+        :param current: list of hashes from current cycle
+        :return: integer number of new results, 0 if unchanged,
+            None if lists cannot be compared and all results
+            need to be checked
+        """
+        if not previous or not current:
+            return None
+        if previous == current:
+            return 0
+        try:
+            return current.index(previous[0])
+        except ValueError:
+            return None
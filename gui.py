@@ -3,7 +3,7 @@
 import tkMessageBox
 from ttk import Progressbar, Style
 from Tkinter import *
-from bot import Bot
+from engine import Engine
 import threading
 import datetime
 # import ttk
@@ -14,21 +14,33 @@ import os
 class Gui(threading.Thread):
     """
     Gui class contains tkinter gui attributes and logic.
-    When gui closed, is_running flag set to false to end
-    bot actions when possible. Gui remains open until
-    bot thread reaches end of run and sets driver to None.
+    Bot runs in a separate engine process and sends log,
+    progress and status events polled by the gui loop. When
+    gui closed, engine is shut down before gui is destroyed.
     """
-    def __init__(self):
+    def __init__(self, bot_options=None):
         threading.Thread.__init__(self)
 
-        # Reference to bot object. Allows bi-directional
-        # communication between gui and bot objects
-        self.bot = None
+        # Engine runs bot in a child process. Gui and bot
+        # communicate using engine command and event queues.
+        self.engine = Engine(bot_options)
 
-        # Bot checks this variable to see status
+        # True from start until engine reports bot stopped
+        self.bot_running = False
+
+        # Gui status. Set to False when gui closed.
         self.is_running = True
         self.secret_key_initialized = False
 
+        # Engine events polled every '_poll_engine_ms'. If bot has not
+        # stopped '_stop_timeout_ms' after stop pressed, engine killed.
+        self._poll_engine_ms = 100
+        self._stop_timeout_ms = 15000
+
+        # Id of pending stop timeout check. Cancelled when bot stops
+        # so it cannot kill the engine during a later stop.
+        self._stop_check = None
+
         # Integer value of time till next refresh of search results
         # Value is set after 'do_update()' completes scraping results.
         # Reduces by 1 every second in gui loop while gui is running.
@@ -44,6 +56,7 @@ class Gui(threading.Thread):
         self.root.after(100, self.change_icon)
         self.root.attributes('-topmost', True)
         self.root.protocol('WM_DELETE_WINDOW', self.confirm_quit)
+        self.root.after(self._poll_engine_ms, self.poll_engine)
 
         # Setup frame
         self.root.frame = Frame(self.root)
@@ -172,59 +185,90 @@ class Gui(threading.Thread):
 
     def start_stop_bot(self):
         """
-        Start or stop bot. Runtime error thrown if thread already started.
+        Start or stop bot depending on whether bot is running.
         """
-        try:
-            if self.bot.is_open():
-
-                # Not in 'stop_bot()' to allow faster disabling of button
-                self.start_stop_button["text"] = "Stopping ..."
-                self.disable(self.start_stop_button)
+        if not self.bot_running:
+            self.start_bot()
+            return
 
-                # After disabling button, driver is closed. After driver
-                # closes successfully, buttons enabled and text changed.
-                self.root.after(10, self.stop_bot)
+        # Disable button until engine reports bot has stopped
+        self.start_stop_button["text"] = "Stopping ..."
+        self.disable(self.start_stop_button)
 
-        except AttributeError:
-            # Bot object set to none exception
-            self.start_bot()
-        except RuntimeError:
-            # Thread already running exception
-            pass
+        # Engine closes driver and sends stopped event. If engine
+        # does not respond in time, engine process is killed.
+        self.engine.stop()
+        self._stop_check = self.root.after(self._stop_timeout_ms, self.check_bot_stopped)
 
     def start_bot(self):
         """
         Method called by start_stop_button to start bot.
-        It creates a new bot instance and sets circular
-        reference in gui and bot objects. After bot has
-        been started, button text changed to Stop.
+        Engine process started if not already running.
+        After bot has been started, button text changed to Stop.
         """
-        self.bot = Bot()
-        self.bot.gui = self
-        self.bot.start()
+        self.engine.start()
+        self.bot_running = True
         self.start_stop_button["text"] = "Stop"
 
     def stop_bot(self):
         """
-        Method called by root.after to close driver and
-        change button text from Stopping to Start. Called
-        by root.after to allow root to update while closing.
+        Called when engine reports bot has stopped. Changes
+        button text from Stopping to Start and enables button.
         """
+        self.bot_running = False
         try:
-            self.bot.driver.quit()
-            self.bot = None
+            if self._stop_check is not None:
+                self.root.after_cancel(self._stop_check)
+                self._stop_check = None
             self.enable(self.start_stop_button)
             self.start_stop_button["text"] = "Start"
             self.update_progress_label("Automation stopped")
-        except (AttributeError, TclError):
-            # Bot has already been closed
+        except TclError:
+            # Gui has already been closed
             pass
 
+    def check_bot_stopped(self):
+        """
+        Kill engine process if bot did not stop after stop pressed.
+        """
+        self._stop_check = None
+        if not self.bot_running or self.start_stop_button["text"] != "Stopping ...":
+            return
+        self.log("Error: Bot did not stop in time. Killing engine process.\n")
+        self.engine.kill()
+        self.stop_bot()
+
+    def poll_engine(self):
+        """
+        Handle events sent by engine process. Runs in gui loop
+        so only gui thread touches tkinter widgets.
+        """
+        for event in self.engine.get_events():
+            name = event[0]
+            if name == "log":
+                self.log(event[1], event[2])
+            elif name == "progress_label":
+                self.update_progress_label(event[1])
+            elif name == "countdown":
+                self.countdown = event[1]
+                self.countdown_max = event[2]
+                self.start_refresh_countdown()
+            elif name == "stopped":
+                self.stop_bot()
+
+        # Engine process ended without reporting bot stopped
+        if self.bot_running and not self.engine.is_alive():
+            self.log("Error: Engine process ended unexpectedly.\n")
+            self.stop_bot()
+
+        if self.is_running:
+            self.root.after(self._poll_engine_ms, self.poll_engine)
+
     def start_refresh_countdown(self):
         self.root.after(100, self.refresh_countdown)
 
     def refresh_countdown(self):
-        if self.bot is None:
+        if not self.bot_running:
             self.update_progress_label("Automation stopped")
             return
 
@@ -288,22 +332,16 @@ class Gui(threading.Thread):
     def confirm_quit(self):
         """
         Handle gui close logic. Sets 'is_running' variable to
-        False. When bot sees gui is no longer running, bot
-        begins closing thread process and driver is set to None.
-        Root is destroyed once bot thread has ended gracefully.
+        False and shuts down engine process. Engine closes driver
+        before ending and is killed if it does not end in time.
+        Root is destroyed once engine process has ended.
         """
         if tkMessageBox.askokcancel("Quit", "Do you really wish to quit?"):
             self.log("Closing application. Please wait ...")
             # Update required to show message in console log
             self.root.update()
             self.is_running = False
-            try:
-                # Wait for bot driver to close
-                while self.bot.driver is not None:
-                    pass
-            except AttributeError:
-                # Bot stopped and set to None
-                pass
+            self.engine.shutdown()
             self.root.destroy()
 
     def run(self):
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+import threading
+import argparse
+import bisect
+import calendar
+import codecs
+import hashlib
+import struct
+import time
+import csv
+import os
+
+
+# Formats of praise time taken from Teams message timestamp title.
+# Last format used by praises exported from history.
+TIME_FORMATS = [
+    "%A, %B %d, %Y %I:%M %p",
+    "%A, %B %d, %Y at %I:%M %p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y, %I:%M %p",
+    "%Y-%m-%d %H:%M:%S",
+]
+
+
+def parse_time_value(time_value):
+    """
+    Convert praise time string to epoch seconds.
+    :param time_value: string time of praise
+    :return: integer epoch seconds or None if format unknown
+    """
+    for time_format in TIME_FORMATS:
+        try:
+            return int(time.mktime(time.strptime(time_value.strip(), time_format)))
+        except ValueError:
+            continue
+    return None
+
+
+def format_time_value(epoch):
+    """
+    Convert epoch seconds to praise time string.
+    :param epoch: integer epoch seconds
+    :return: string time in last of TIME_FORMATS
+    """
+    return time.strftime(TIME_FORMATS[-1], time.localtime(epoch))
+
+
+def wall_time(epoch):
+    """
+    Convert epoch seconds to local wall clock time read as UTC.
+    Same praise time string gives same wall time in any time zone,
+    so client and server can compare praises without time zones.
+    :param epoch: integer epoch seconds
+    :return: integer wall time seconds
+    """
+    return calendar.timegm(time.localtime(epoch))
+
+
+def bucket_digests(keys, start, bucket_seconds):
+    """
+    Hash praise keys per time bucket. Used by reconciliation to find
+    buckets that differ between local history and server database.
+    :param keys: iterable of (wall time, praiser name, praised name)
+    :param start: integer wall time of first bucket
+    :param bucket_seconds: integer length of each bucket
+    :return: dictionary of [count, md5 hex digest] keyed by bucket
+        start. Empty buckets left out.
+    """
+    buckets = {}
+    for key in set(keys):
+        bucket = start + (key[0] - start) // bucket_seconds * bucket_seconds
+        buckets.setdefault(bucket, []).append(key)
+    digests = {}
+    for bucket, bucket_keys in buckets.items():
+        lines = u"\n".join(u"{}|{}|{}".format(*key) for key in sorted(bucket_keys))
+        digests[bucket] = [len(bucket_keys), hashlib.md5(lines.encode("utf-8")).hexdigest()]
+    return digests
+
+
+class PraiseHistory(object):
+    """
+    PraiseHistory stores every praise added to the database in a
+    local columnar store. Each column is a typed array of 4 byte
+    integers kept in its own file and appended as praises are
+    added. Names are interned, so each praise costs 12 bytes.
+    Range queries use a time index built when first needed.
+    """
+
+    # Array typecode of every column. 4 byte unsigned integer.
+    TYPECODE = "I"
+
+    # Column names. Each column stored in COLUMN.col
+    COLUMNS = ["time", "praiser", "praised"]
+
+    # Header of binary columnar export
+    EXPORT_MAGIC = b"PRAISECOL1"
+
+    def __init__(self, directory):
+        # Directory containing column files and names file
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Column arrays keyed by column name
+        self.columns = dict((column, array(self.TYPECODE)) for column in self.COLUMNS)
+
+        # Interned names. Name id is index in 'names'.
+        self.names = []
+        self._name_ids = {}
+
+        # Time index. Row numbers ordered by time and matching times.
+        # Built when first range query made, then extended by appends.
+        self._order = None
+        self._ordered_times = None
+
+        # Appends made from bot and uploader threads
+        self._lock = threading.Lock()
+
+        self.load()
+
+        # Files kept open for appending
+        self._column_files = dict(
+            (column, open(self.column_path(column), "ab")) for column in self.COLUMNS)
+        self._names_file = codecs.open(self.names_path(), "a", "utf-8")
+
+    def column_path(self, column):
+        return os.path.join(self.directory, column + ".col")
+
+    def names_path(self):
+        return os.path.join(self.directory, "names.txt")
+
+    def load(self):
+        """
+        Read column files and names file. Each column read with a
+        single call. If praise was partly written when application
+        ended, columns truncated to the shortest column.
+        """
+        if os.path.isfile(self.names_path()):
+            with codecs.open(self.names_path(), "r", "utf-8") as names_file:
+                for line in names_file:
+                    self._name_ids[line.rstrip("\n")] = len(self.names)
+                    self.names.append(line.rstrip("\n"))
+
+        for column in self.COLUMNS:
+            path = self.column_path(column)
+            if not os.path.isfile(path):
+                continue
+            values = self.columns[column]
+            with open(path, "rb") as column_file:
+                values.fromfile(column_file, os.path.getsize(path) // values.itemsize)
+
+        length = len(self)
+        for column in self.COLUMNS:
+            values = self.columns[column]
+            if len(values) > length:
+                del values[length:]
+                with open(self.column_path(column), "wb") as column_file:
+                    values.tofile(column_file)
+
+    def __len__(self):
+        return min(len(values) for values in self.columns.values())
+
+    def intern(self, name):
+        """
+        Get id of name, adding name if not seen before.
+        :param name: string full name
+        :return: integer name id
+        """
+        if isinstance(name, str):
+            name = name.decode("utf-8")
+        name = name.replace(u"\n", u" ")
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self._name_ids[name] = name_id
+            self.names.append(name)
+            self._names_file.write(name + u"\n")
+            self._names_file.flush()
+        return name_id
+
+    def append(self, epoch, praiser_name, praised_name):
+        """
+        Add praise to history.
+        :param epoch: integer epoch seconds of praise
+        :param praiser_name: string full name of praiser
+        :param praised_name: string full name of praised
+        """
+        with self._lock:
+            row = {
+                "time": epoch,
+                "praiser": self.intern(praiser_name),
+                "praised": self.intern(praised_name),
+            }
+            for column in self.COLUMNS:
+                self.columns[column].append(row[column])
+                self.columns[column][-1:].tofile(self._column_files[column])
+                self._column_files[column].flush()
+            if self._order is not None:
+                self.index_row(len(self) - 1)
+
+    def index_row(self, row):
+        """
+        Add appended row to time index. Praises usually appended in
+        time order, so row normally added at end. Older praise
+        inserted at its position.
+        :param row: integer row number
+        """
+        epoch = self.columns["time"][row]
+        if not self._ordered_times or epoch >= self._ordered_times[-1]:
+            self._order.append(row)
+            self._ordered_times.append(epoch)
+            return
+        position = bisect.bisect_right(self._ordered_times, epoch)
+        self._order.insert(position, row)
+        self._ordered_times.insert(position, epoch)
+
+    def build_index(self):
+        """
+        Sort row numbers by time for range queries. Rows already in
+        time order, the usual case, indexed without sorting.
+        """
+        times = self.columns["time"]
+        length = len(self)
+        if all(times[row] <= times[row + 1] for row in xrange(length - 1)):
+            self._order = array(self.TYPECODE, xrange(length))
+            self._ordered_times = times[:length]
+            return
+        self._order = array(self.TYPECODE, sorted(xrange(length), key=times.__getitem__))
+        self._ordered_times = array(self.TYPECODE, (times[row] for row in self._order))
+
+    def query_rows(self, start=None, end=None):
+        """
+        Get row numbers of praises in time range ordered by time.
+        :param start: integer epoch seconds, inclusive. None for all.
+        :param end: integer epoch seconds, exclusive. None for all.
+        :return: array of row numbers
+        """
+        with self._lock:
+            if self._order is None:
+                self.build_index()
+            low = 0 if start is None else bisect.bisect_left(self._ordered_times, start)
+            high = len(self._order) if end is None else bisect.bisect_left(self._ordered_times, end)
+            return self._order[low:high]
+
+    def query(self, start=None, end=None):
+        """
+        Get praises in time range ordered by time.
+        :param start: integer epoch seconds, inclusive. None for all.
+        :param end: integer epoch seconds, exclusive. None for all.
+        :return: generator of (epoch, praiser name, praised name)
+        """
+        times = self.columns["time"]
+        praisers = self.columns["praiser"]
+        praised = self.columns["praised"]
+        for row in self.query_rows(start, end):
+            yield times[row], self.names[praisers[row]], self.names[praised[row]]
+
+    def export_csv(self, path, start=None, end=None):
+        """
+        Write praises in time range to CSV file.
+        :param path: string filepath of CSV file
+        :return: integer number of praises written
+        """
+        count = 0
+        with open(path, "wb") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["time", "praiser", "praised"])
+            for epoch, praiser_name, praised_name in self.query(start, end):
+                writer.writerow(
+                    [format_time_value(epoch), praiser_name.encode("utf-8"), praised_name.encode("utf-8")])
+                count += 1
+        return count
+
+    def export_columns(self, path, start=None, end=None):
+        """
+        Write praises in time range to binary columnar file. File
+        contains magic, praise count and names count as 4 byte
+        little endian integers, then names as UTF-8 separated by
+        newlines, then time, praiser and praised column arrays.
+        :param path: string filepath of binary file
+        :return: integer number of praises written
+        """
+        rows = self.query_rows(start, end)
+        names = u"\n".join(self.names).encode("utf-8")
+        with open(path, "wb") as binary_file:
+            binary_file.write(self.EXPORT_MAGIC)
+            binary_file.write(struct.pack("<III", len(rows), len(self.names), len(names)))
+            binary_file.write(names)
+            for column in self.COLUMNS:
+                values = self.columns[column]
+                exported = array(self.TYPECODE, (values[row] for row in rows))
+                if struct.pack("=I", 1) != struct.pack("<I", 1):
+                    exported.byteswap()
+                exported.tofile(binary_file)
+        return len(rows)
+
+    def close(self):
+        for column_file in self._column_files.values():
+            column_file.close()
+        self._names_file.close()
+
+
+def main():
+    """
+    Export praise history to CSV or binary columnar file.
+    """
+    parser = argparse.ArgumentParser(description="Export Praise Counter history")
+    parser.add_argument("directory", help="History directory")
+    parser.add_argument("output", help="Output filepath")
+    parser.add_argument("--format", default="csv", choices=["csv", "columns"])
+    parser.add_argument("--start", default=None, help="First day exported, YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="Day after last day exported, YYYY-MM-DD")
+    arguments = parser.parse_args()
+
+    start = arguments.start and int(time.mktime(time.strptime(arguments.start, "%Y-%m-%d")))
+    end = arguments.end and int(time.mktime(time.strptime(arguments.end, "%Y-%m-%d")))
+
+    history = PraiseHistory(arguments.directory)
+    if arguments.format == "csv":
+        count = history.export_csv(arguments.output, start, end)
+    else:
+        count = history.export_columns(arguments.output, start, end)
+    history.close()
+    print "{} praises exported".format(count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+from selenium.common.exceptions import NoSuchElementException, JavascriptException, InvalidSelectorException
+from selenium.webdriver.common.by import By
+from collections import deque
+
+
+# Strategy type of locators using a script. Script is given the
+# context element (null if page) and the values of the lookup, and
+# returns the element (or list of elements for find_all) or null.
+JS = "js"
+
+
+# Candidate strategies of each logical element, in order tried until
+# success rates and latencies are known. CSS and XPath values are
+# formatted with the values of the lookup. Scripts are not formatted,
+# values are passed as arguments[1].
+LOCATORS = {
+    "search_input": [
+        (By.CSS_SELECTOR, "input#searchInputField"),
+        (By.XPATH, "//input[@id='searchInputField']"),
+        (JS, "return document.querySelector(\"input[type='search'], input[aria-label*='Search']\");"),
+    ],
+    "secret_key_result": [
+        (By.XPATH,
+         "//div[@class='search-content']//span[contains(text(),'{owner}')]"
+         "/../..//div[contains(@class,'search-chat-body')]"),
+        (JS,
+         "var spans = document.querySelectorAll('.search-content span');"
+         "for (var i = 0; i < spans.length; i++) {"
+         "  if (spans[i].textContent.indexOf(arguments[1].owner) < 0) continue;"
+         "  var body = spans[i].parentElement.parentElement.querySelector('.search-chat-body');"
+         "  if (body) return body;"
+         "}"
+         "return null;"),
+    ],
+    "search_result": [
+        (By.CSS_SELECTOR, ".search-content > div:nth-of-type({index}) > div[data-tid*='search-content-item']"),
+        (By.XPATH, "//div[@class='search-content']/div[{index}]/div[contains(@data-tid, 'search-content-item')]"),
+        (JS,
+         "var result = document.querySelectorAll('.search-content > div')[arguments[1].index - 1];"
+         "return result ? result.querySelector(\"[data-tid*='search-content-item']\") : null;"),
+    ],
+    "search_result_name": [
+        (By.CSS_SELECTOR, ".search-content > div:nth-of-type({index}) .search-chat-entry-name-time > span.user-name"),
+        (By.XPATH,
+         "//div[@class='search-content']/div[{index}]//div[contains(@class,'search-chat-entry-name-time')]"
+         "/span[contains(@class,'user-name')]"),
+    ],
+    "search_result_text": [
+        (By.CSS_SELECTOR, ".search-content > div:nth-of-type({index}) .search-chat-body"),
+        (By.XPATH, "//div[@class='search-content']/div[{index}]//div[contains(@class,'search-chat-body')]"),
+    ],
+    "search_results": [
+        (By.CSS_SELECTOR, "div[ng-repeat='item in sc.result']"),
+        (By.XPATH, "//div[@ng-repeat='item in sc.result']"),
+    ],
+    "praise_card": [
+        (By.XPATH,
+         "//div[@class='card-body']//div[@class='ac-container']//div[@class='ac-textBlock'][1]"
+         "/p[contains(text(), '{praiser}')]/../../div[3]"
+         "/p[contains(text(), '{praised}')]/../../div"
+         "//p[contains(text(), '{text}')]/../../../../../.."
+         "//span[contains(text(),'Praise')]"),
+        (JS,
+         "var values = arguments[1];"
+         "var cards = document.querySelectorAll('.card-body');"
+         "for (var i = 0; i < cards.length; i++) {"
+         "  var text = cards[i].textContent;"
+         "  if (text.indexOf(values.praiser) < 0 || text.indexOf(values.praised) < 0 ||"
+         "      text.indexOf(values.text) < 0) continue;"
+         "  for (var node = cards[i], level = 0; node && level < 6; node = node.parentElement, level++) {"
+         "    var spans = node.querySelectorAll('span');"
+         "    for (var j = 0; j < spans.length; j++) {"
+         "      if (spans[j].textContent.indexOf('Praise') >= 0) return spans[j];"
+         "    }"
+         "  }"
+         "}"
+         "return null;"),
+    ],
+    "praised_name": [
+        (By.XPATH,
+         "//div[@class='card-body']//div[@class='ac-container']//div[@class='ac-textBlock'][1]"
+         "/p[contains(text(),'{praiser}')]/../../div"
+         "//p[contains(text(),'{text}')]/../../div[3]"
+         "/p[contains(text(),'{praised}')]"),
+        (JS,
+         "var values = arguments[1];"
+         "var containers = document.querySelectorAll('.card-body .ac-container');"
+         "for (var i = 0; i < containers.length; i++) {"
+         "  var blocks = containers[i].children;"
+         "  if (blocks.length < 3 || containers[i].textContent.indexOf(values.text) < 0) continue;"
+         "  var praiser = blocks[0].querySelector('p');"
+         "  var praised = blocks[2].querySelector('p');"
+         "  if (praiser && praised && praiser.textContent.indexOf(values.praiser) >= 0 &&"
+         "      praised.textContent.indexOf(values.praised) >= 0) return praised;"
+         "}"
+         "return null;"),
+    ],
+    "praise_time": [
+        (JS,
+         "for (var node = arguments[0]; node; node = node.parentElement) {"
+         "  var stamp = node.querySelector(\"span[data-tid='messageTimeStamp']\");"
+         "  if (stamp) return stamp;"
+         "}"
+         "return null;"),
+        (By.XPATH,
+         "./../../../../../../../../../../../../../../../../../../../"
+         "/div/div/div/span[@data-tid='messageTimeStamp']"),
+    ],
+}
+
+
+class InvalidLocatorError(Exception):
+    """
+    Raised while waiting when values made locator invalid. Selenium
+    3 InvalidSelectorException is a NoSuchElementException, which
+    WebDriverWait would keep retrying until timeout.
+    """
+    pass
+
+
+class Strategy(object):
+    """
+    Strategy is one way of locating a logical element. Outcomes of
+    recent lookups kept to rank strategy against the others.
+    """
+
+    def __init__(self, name, by, value):
+        # Name used by AdaptiveWait to learn timeout of strategy
+        self.name = name
+
+        # Selenium By strategy or JS, and locator value or script
+        self.by = by
+        self.value = value
+
+        # True for each recent lookup found by strategy, False for
+        # each lookup strategy missed but another strategy found
+        self.outcomes = deque(maxlen=20)
+
+    def reliability(self):
+        """
+        Success rate of recent lookups. Strategy not yet used counts
+        as reliable, one miss of a new strategy demotes it.
+        :return: float between 0 and 1
+        """
+        return (sum(self.outcomes) + 1.0) / (len(self.outcomes) + 1)
+
+    def locate(self, driver, context, values):
+        """
+        Get locate function waited on by AdaptiveWait.
+        :return: function given context, returns element
+        """
+        if self.by == JS:
+            return lambda searched: self.run_script(driver, context, values)
+        value = unicode(self.value).format(**values)
+
+        def locate(searched):
+            try:
+                return searched.find_element(self.by, value)
+            except InvalidSelectorException as exception:
+                # Message quotes locator value, which may not be ASCII.
+                # Passed on as is since str() of it fails in Python 2.
+                raise InvalidLocatorError(exception.msg)
+
+        return locate
+
+    def probe(self, driver, context, values):
+        """
+        Find elements without waiting.
+        :return: list of elements, empty if none found
+        """
+        if self.by == JS:
+            found = self.run_script(driver, context, values)
+            if found is None:
+                return []
+            return found if isinstance(found, list) else [found]
+        return (context or driver).find_elements(self.by, unicode(self.value).format(**values))
+
+    def run_script(self, driver, context, values):
+        try:
+            return driver.execute_script(self.value, context, values)
+        except JavascriptException:
+            # Script broken by markup change. Counts as not found.
+            return None
+
+
+class LocatorRegistry(object):
+    """
+    LocatorRegistry finds logical elements using ranked fallback
+    strategies. Reliable strategies are tried first, fastest first.
+    Only the first valid strategy is waited for. If it times out,
+    the others are checked once without waiting. A strategy that misses
+    an element found by another strategy is demoted, so markup
+    changes cost one wait instead of a wait on every lookup.
+    """
+
+    def __init__(self, driver, waits, locators=None):
+        # Selenium driver used to find elements and run scripts
+        self.driver = driver
+
+        # AdaptiveWait learning timeout of each strategy
+        self.waits = waits
+
+        # Strategies keyed by logical element name
+        self.strategies = {}
+        for name, candidates in (locators or LOCATORS).items():
+            self.strategies[name] = [
+                Strategy("{}#{}".format(name, index), by, value) for index, (by, value) in enumerate(candidates)]
+
+        # Success rate below which strategy is demoted behind
+        # reliable strategies
+        self._reliable_rate = 0.8
+
+    def ranked(self, name):
+        """
+        Order strategies of element. Reliable strategies first, then
+        strategies with known latency, fastest first, then strategies
+        in declared order.
+        :param name: string logical element name
+        :return: list of Strategy
+        """
+        strategies = self.strategies[name]
+
+        def rank(index):
+            strategy = strategies[index]
+            latency = self.waits.latency(strategy.name)
+            return strategy.reliability() < self._reliable_rate, latency is None, latency, index
+
+        return [strategies[index] for index in sorted(range(len(strategies)), key=rank)]
+
+    def probe(self, strategy, context, values):
+        """
+        Find elements using strategy without waiting. Strategy made
+        invalid by values demoted and treated as finding nothing.
+        :return: list of elements, empty if none found
+        """
+        try:
+            return strategy.probe(self.driver, context, values)
+        except InvalidSelectorException:
+            strategy.outcomes.append(False)
+            return []
+
+    def find(self, name, context=None, **values):
+        """
+        Wait for element using best strategy, then check fallback
+        strategies without waiting.
+        :param name: string logical element name
+        :param context: element searched from, driver if None
+        :param values: values formatted into locators, e.g. index
+        :return: element found
+        :raises NoSuchElementException: if no strategy finds element
+        """
+        strategies = self.ranked(name)
+
+        # Best strategy waited for. Strategies made invalid by values
+        # demoted and the next strategy waited for instead.
+        waited = None
+        for index, strategy in enumerate(strategies):
+            try:
+                element = self.waits.until(
+                    strategy.name, strategy.locate(self.driver, context, values), context)
+                strategy.outcomes.append(True)
+                return element
+            except InvalidLocatorError:
+                # Value made locator invalid, e.g. name with apostrophe
+                strategy.outcomes.append(False)
+            except NoSuchElementException:
+                waited = index
+                break
+
+        if waited is not None:
+            for strategy in strategies[waited + 1:]:
+                found = self.probe(strategy, context, values)
+                if found:
+                    # Waited strategy missed an element that exists
+                    strategies[waited].outcomes.append(False)
+                    strategy.outcomes.append(True)
+                    return found[0]
+
+        # Element not on page, e.g. search result is not a praise.
+        # No strategy at fault so none demoted.
+        raise NoSuchElementException("{} not found by any locator".format(name))
+
+    def find_all(self, name, context=None, **values):
+        """
+        Find elements without waiting. Used once page known to be
+        rendered. First strategy finding any elements used.
+        :return: list of elements, empty if none found
+        """
+        for strategy in self.ranked(name):
+            found = self.probe(strategy, context, values)
+            if found:
+                strategy.outcomes.append(True)
+                return found
+        return []
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+
+class PraiseObserver:
+    """
+    PraiseObserver contains the scripts used to capture praise
+    cards as Teams renders them. A MutationObserver is injected
+    into the page and buffers each new praise card in the page.
+    Bot drains the buffer with a cheap asynchronous script call
+    instead of waiting for the next full search refresh.
+    """
+
+    # Injected once per page load. Observer watches the whole Teams
+    # app for added nodes and scrapes any praise card found inside.
+    # Only cards posted since the observer was installed are buffered,
+    # so old cards rendered when bot opens a conversation are not
+    # uploaded again. Praise keys are remembered so a card re-rendered
+    # by Teams (scrolling, switching chats) is only buffered once.
+    INSTALL_SCRIPT = """
+        if (window.__praiseObserver) {
+            return false;
+        }
+        window.__praiseBuffer = [];
+        window.__praiseSeen = {};
+
+        // Timestamps only show minutes, so cutoff rounded down to minute
+        window.__praiseSince = Math.floor(Date.now() / 60000) * 60000;
+
+        function praiseText(element) {
+            return element ? (element.textContent || "").trim() : "";
+        }
+
+        // Timestamp title, e.g. "Monday, January 6, 2020 10:30 AM",
+        // converted to milliseconds. Null if format unknown.
+        function praiseTime(title) {
+            var time = Date.parse(title.replace(/^[A-Za-z]+, /, "").replace(" at ", " "));
+            return isNaN(time) ? null : time;
+        }
+
+        // Praise of card with key and time, null if not a praise
+        function readCard(card) {
+            var blocks = card.querySelectorAll("div.ac-container > div.ac-textBlock");
+            if (blocks.length < 3) {
+                return null;
+            }
+            var message = card;
+            var timestamp = null;
+            while (message && !timestamp) {
+                message = message.parentElement;
+                if (message) {
+                    timestamp = message.querySelector("span[data-tid='messageTimeStamp']");
+                }
+            }
+            if (!timestamp || message.textContent.indexOf("Praise") === -1) {
+                return null;
+            }
+            var praise = {
+                time: timestamp.getAttribute("title") || "",
+                praiser: praiseText(blocks[0].querySelector("p")),
+                praised: praiseText(blocks[2].querySelector("p"))
+            };
+            if (!praise.time || !praise.praiser || !praise.praised) {
+                return null;
+            }
+            return {
+                praise: praise,
+                key: praise.time + "|" + praise.praiser + "|" + praise.praised,
+                time: praiseTime(praise.time)
+            };
+        }
+
+        function scrapeCard(card) {
+            var read = readCard(card);
+            if (!read || window.__praiseSeen[read.key]) {
+                return;
+            }
+            if (read.time === null || read.time < window.__praiseSince) {
+                return;
+            }
+            window.__praiseSeen[read.key] = read.time;
+            window.__praiseBuffer.push(read.praise);
+        }
+
+        // Card of praise added by bot marked as seen and taken out of
+        // buffer, so drain does not upload it a second time
+        window.__praiseMark = function (element) {
+            var card = null;
+            for (var node = element; node && !card; node = node.parentElement) {
+                card = node.classList && node.classList.contains("card-body") ?
+                    node : node.querySelector("div.card-body");
+            }
+            var read = card ? readCard(card) : null;
+            if (!read) {
+                return false;
+            }
+            window.__praiseSeen[read.key] = read.time === null ? Date.now() : read.time;
+            window.__praiseBuffer = window.__praiseBuffer.filter(function (praise) {
+                return praise.time + "|" + praise.praiser + "|" + praise.praised !== read.key;
+            });
+            return true;
+        };
+
+        window.__praiseObserver = new MutationObserver(function (mutations) {
+            for (var i = 0; i < mutations.length; i++) {
+                var added = mutations[i].addedNodes;
+                for (var j = 0; j < added.length; j++) {
+                    var node = added[j];
+                    if (node.nodeType !== 1) {
+                        continue;
+                    }
+                    if (node.classList.contains("card-body")) {
+                        scrapeCard(node);
+                    }
+                    var cards = node.querySelectorAll("div.card-body");
+                    for (var k = 0; k < cards.length; k++) {
+                        scrapeCard(cards[k]);
+                    }
+                }
+            }
+        });
+        window.__praiseObserver.observe(document.body, {childList: true, subtree: true});
+        return true;
+    """
+
+    # Asynchronous drain. Buffer swapped out in a single call so
+    # praises added while the result travels back are not lost.
+    # Cutoff moved up to the drain time less arguments[0] seconds,
+    # and keys of cards older than cutoff forgotten, so the seen map
+    # only holds recent cards during a long session.
+    DRAIN_SCRIPT = """
+        var done = arguments[arguments.length - 1];
+        if (!window.__praiseObserver) {
+            done(null);
+            return;
+        }
+        var since = Math.floor((Date.now() - arguments[0] * 1000) / 60000) * 60000;
+        if (since > window.__praiseSince) {
+            window.__praiseSince = since;
+            for (var key in window.__praiseSeen) {
+                if (window.__praiseSeen[key] < since) {
+                    delete window.__praiseSeen[key];
+                }
+            }
+        }
+        var buffer = window.__praiseBuffer;
+        window.__praiseBuffer = [];
+        done(buffer);
+    """
+
+    # Marks praise card found by bot as already added. Does nothing
+    # if observer lost with page reload.
+    MARK_SCRIPT = """
+        return window.__praiseMark ? window.__praiseMark(arguments[0]) : false;
+    """
+
+    def __init__(self, driver):
+        # Selenium driver the observer is injected into
+        self.driver = driver
+
+        # Cards posted more than 'grace_seconds' before a drain are
+        # left to search refresh. Allows for cards Teams renders late.
+        self.grace_seconds = 600
+
+    def install(self):
+        """
+        Inject MutationObserver into current page. Script checks
+        for an existing observer so calling install again on the
+        same page does nothing.
+        :return: boolean True if a new observer was injected
+        """
+        return bool(self.driver.execute_script(self.INSTALL_SCRIPT))
+
+    def mark(self, element):
+        """
+        Mark praise card added by bot as seen, so observer does not
+        buffer it again when bot renders it by clicking search result.
+        :param element: element inside or containing praise card
+        :return: boolean True if card found and marked
+        """
+        return bool(self.driver.execute_script(self.MARK_SCRIPT, element))
+
+    def drain(self):
+        """
+        Remove and return praises buffered by the observer. If the
+        page was reloaded and the observer lost, it is reinstalled.
+        :return: list of dictionaries with time, praiser and praised
+        """
+        buffer = self.driver.execute_async_script(self.DRAIN_SCRIPT, self.grace_seconds)
+        if buffer is None:
+            self.install()
+            return []
+        return buffer
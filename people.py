@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import codecs
+import json
+import os
+
+
+class PeopleDirectory(object):
+    """
+    PeopleDirectory maps names seen on Teams to canonical full names.
+    Display names and names marked for deletion resolve to the same
+    full name, so each person is counted consistently. Names cut off
+    with ellipses in search snippets resolve by prefix. Full names
+    learned as praises are scraped and saved to a JSON file.
+    """
+
+    # Text Teams appends to names of users marked for deletion
+    MARKED_FOR_DELETION = " [Marked "
+
+    def __init__(self, path=None):
+        # JSON file used to keep directory between runs
+        self.path = path or self.default_path()
+
+        # Canonical full names keyed by lower case full name
+        self._names = {}
+
+        # True if names learned since last save
+        self._dirty = False
+
+        # Names learned from bot and uploader threads
+        self._lock = threading.Lock()
+
+        self.load()
+
+    @staticmethod
+    def default_path():
+        """
+        :return: string filepath of directory in local app data
+        """
+        return os.path.join(os.getenv("LOCALAPPDATA") or os.path.abspath("."), "PraiseCounter", "people.json")
+
+    @classmethod
+    def normalize(cls, name):
+        """
+        Remove deletion marker, ellipses and extra spaces from name.
+        :param name: string name as shown on Teams
+        :return: string cleaned name
+        """
+        name = name.partition(cls.MARKED_FOR_DELETION)[0]
+        name = name.partition("...")[0].partition(u"…")[0]
+        return u" ".join(name.split())
+
+    def load(self):
+        """
+        Read full names saved by previous runs.
+        """
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with codecs.open(self.path, "r", "utf-8") as people_file:
+                names = json.load(people_file)
+        except (IOError, ValueError):
+            # Unreadable directory rebuilt as praises are scraped
+            return
+        for name in names:
+            self.add(name)
+
+    def save(self):
+        """
+        Write full names to JSON file if any names learned.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            names = sorted(set(self._names.values()))
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with codecs.open(self.path, "w", "utf-8") as people_file:
+            json.dump(names, people_file, ensure_ascii=False, indent=0)
+
+    def add(self, full_name):
+        """
+        Add full name to lookup tables.
+        :param full_name: string cleaned full name
+        :return: boolean True if name not seen before
+        """
+        key = full_name.lower()
+        if not key or key in self._names:
+            return False
+        self._names[key] = full_name
+        return True
+
+    def learn(self, name):
+        """
+        Record full name seen on Teams.
+        :param name: string full name as shown on Teams
+        :return: string canonical full name
+        """
+        full_name = self.normalize(name)
+        with self._lock:
+            if self.add(full_name):
+                self._dirty = True
+            return self._names.get(full_name.lower(), full_name)
+
+    def resolve(self, name):
+        """
+        Find full name of person. Only exact full names match, so a
+        one word display name is never taken for a known person.
+        :param name: string full name or display name
+        :return: string canonical full name or None if not known
+        """
+        key = self.normalize(name).lower()
+        if not key:
+            return None
+        with self._lock:
+            return self._names.get(key)
+
+    def resolve_truncated(self, name):
+        """
+        Find full name of person from name cut off with ellipses in
+        search snippet. Resolves only if exactly one known person
+        has a full name starting with what is left.
+        :param name: string name ending with ellipses
+        :return: string canonical full name or None if not known
+        """
+        key = self.normalize(name).lower()
+        if not key:
+            return None
+        with self._lock:
+            matches = [full_name for full_key, full_name in self._names.items() if full_key.startswith(key)]
+            if len(matches) == 1:
+                return matches[0]
+            return None
+
+    def canonical(self, name):
+        """
+        Get name used when praise added to database.
+        :param name: string name as shown on Teams
+        :return: string known full name, or cleaned name if unknown
+        """
+        return self.resolve(name) or self.normalize(name)
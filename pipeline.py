@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+from bot import Bot
+import threading
+import Queue
+import time
+
+
+class Uploader(threading.Thread):
+    """
+    Uploader runs web server calls on its own thread in the order
+    they are submitted. Scraping continues while praises are being
+    uploaded. Queue size is limited so scraping cannot run far ahead
+    of the web server.
+    """
+
+    def __init__(self, max_pending=4, log=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        # Calls waiting to be run. None ends thread.
+        self._tasks = Queue.Queue(max_pending)
+
+        # Function given text to log errors of calls
+        self.log = log
+
+        # Result of most recently completed praise upload. None until
+        # first upload completes.
+        self.last_result = None
+
+        # Number of praise uploads that did not add praise or find
+        # duplicate. Checked after each update.
+        self.failure_count = 0
+
+        # Praise upload count and total seconds from submit to
+        # completion. Used to measure upload latency.
+        self.upload_count = 0
+        self.upload_seconds = 0.0
+
+    def submit(self, function, *args):
+        """
+        Queue call to be run on uploader thread. Blocks if queue full.
+        :param function: callable run on uploader thread
+        :param args: arguments passed to function
+        """
+        self._tasks.put((time.time(), function, args))
+
+    def stop(self):
+        """
+        End thread after queued calls have completed.
+        """
+        self._tasks.put(None)
+
+    def run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            submitted, function, args = task
+            try:
+                result = function(*args)
+            except Exception as exception:
+                # Thread must keep running or scraping blocks on full queue
+                result = "0"
+                if self.log is not None:
+                    self.log(u"Error: Upload task failed. {}: {}\n".format(type(exception).__name__, exception))
+            if function == Bot.do_add_praises:
+                self.last_result = result
+                if result not in ("1", "2"):
+                    self.failure_count += 1
+                self.upload_count += 1
+                self.upload_seconds += time.time() - submitted
+
+
+class PipelinedBot(Bot):
+    """
+    PipelinedBot scrapes and uploads at the same time. Praise
+    uploads and refresh time updates are handed to an Uploader
+    thread instead of blocking scraping. Duplicate threshold uses
+    the latest completed upload, so a few extra search results may
+    be checked before scraping stops. Uploads failing after update
+    ends clear search result fingerprint, so results are checked
+    again next update.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Bot.__init__(self, *args, **kwargs)
+
+        # Thread used for web server calls
+        self.uploader = Uploader(log=lambda text: self.gui.log(text))
+
+        # Upload failure count when last update was checked
+        self._checked_failure_count = 0
+
+    def do_add_praises(self, time_value, praiser_name, praised_name):
+        """
+        Queue praise upload.
+        :return: string web server result of latest completed upload,
+            None if no upload completed yet
+        """
+        self.uploader.submit(Bot.do_add_praises, self, time_value, praiser_name, praised_name)
+        return self.uploader.last_result
+
+    def do_update_time(self):
+        """
+        Queue refresh time update. Runs after queued praise uploads.
+        """
+        self.uploader.submit(Bot.do_update_time, self)
+        self.uploader.submit(self.check_uploads)
+        self.uploader.submit(self.log_upload_latency)
+
+    def check_uploads(self):
+        """
+        Runs on uploader thread after uploads of an update. If any
+        upload failed, search result fingerprint saved by update is
+        cleared so failed praises are scraped again next update.
+        """
+        failures = self.uploader.failure_count - self._checked_failure_count
+        self._checked_failure_count = self.uploader.failure_count
+        if failures:
+            self._result_fingerprint = []
+            self.gui.log("Error: {} praise uploads failed. All search results checked next update.\n".format(
+                failures))
+
+    def log_upload_latency(self):
+        """
+        Log average time from praise scraped to praise uploaded.
+        """
+        if self.uploader.upload_count:
+            self.gui.log("{} praises uploaded. Average upload latency {:.2f} seconds\n".format(
+                self.uploader.upload_count, self.uploader.upload_seconds / self.uploader.upload_count))
+
+    def run(self):
+        self.uploader.start()
+        try:
+            Bot.run(self)
+        finally:
+            self.uploader.stop()
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from gui import Gui
+import multiprocessing
+import argparse
 
 
 def main():
@@ -8,12 +10,42 @@ def main():
     Praise Counter main module
     """
 
+    # Command line options passed to bot when bot started
+    parser = argparse.ArgumentParser(description="Teams Praise Counter")
+    parser.add_argument(
+        "--server-base", default=None,
+        help="Url of praise server, e.g. http://127.0.0.1:8000/ for a server started using server.py")
+    parser.add_argument(
+        "--engine", default="threaded", choices=["threaded", "pipelined"],
+        help="Threaded bot uploads each praise before scraping the next. "
+             "Pipelined bot scrapes while praises are uploaded.")
+    parser.add_argument(
+        "--history-dir", default=None,
+        help="Directory of local praise history. Praises added to database are also stored here.")
+    parser.add_argument(
+        "--lease", default=None,
+        help="Leader election when several instances run. 'server' stores lease on praise server, "
+             "otherwise filepath of lease file on a shared drive. Only leader scrapes.")
+    parser.add_argument(
+        "--snapshot-dir", default=None,
+        help="Directory where page source is saved when an update fails. Parsed using praise_parser.py.")
+    arguments = parser.parse_args()
+    bot_options = {
+        "server_base": arguments.server_base,
+        "engine": arguments.engine,
+        "history_dir": arguments.history_dir,
+        "lease": arguments.lease,
+        "snapshot_dir": arguments.snapshot_dir,
+    }
+
     # Initialize and run gui. Gui contains console and buttons.
     # Gui contains buttons to instantiate and start Bot object.
-    # Gui and Bot object circular reference set when bot started.
-    gui = Gui()
+    # Bot runs in an engine process started when bot started.
+    gui = Gui(bot_options)
     gui.start()
 
 
 if __name__ == '__main__':
+    # Required for engine process when running as frozen EXE
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+from HTMLParser import HTMLParser
+from people import PeopleDirectory
+from reconcile import Reconciler
+import multiprocessing
+import argparse
+import codecs
+import csv
+import os
+
+
+# Text separating praised first name from praise text in search
+# result snippets, e.g. "John got praise! Great work John Smith"
+GOT_PRAISE = " got praise! "
+
+# Elements without end tags. Not kept open while parsing.
+VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+])
+
+# Elements whose text is separated from neighbouring text
+BLOCK_TAGS = frozenset([
+    "br", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "p", "tr",
+])
+
+
+def is_praise_text(text_value):
+    """
+    :param text_value: string search result snippet
+    :return: boolean True if snippet is a praise
+    """
+    return GOT_PRAISE in text_value
+
+
+def praise_text_length(text_value, praised_first_name):
+    """
+    Get length of praise text used to find praise card. Long text
+    cut to 20 characters, short text padded to 5 characters.
+    :param text_value: string praise text after praised first name
+    :param praised_first_name: string first name of praised
+    :return: integer length of praise text
+    """
+    text_value_length = len(text_value)
+    if text_value_length >= 20:
+        return 20
+    elif 6 <= text_value_length < 20:
+        return text_value_length
+    elif 0 < text_value_length <= 5:
+        return 5
+    return len(praised_first_name)
+
+
+def split_praise_text(text_value):
+    """
+    Split search result snippet into praised first name and start
+    of praise text. Both used to find praise card of search result.
+    :param text_value: string search result snippet
+    :return: tuple of praised first name and praise text, or None
+        if snippet is not a praise
+    """
+    if not is_praise_text(text_value):
+        return None
+
+    # First name found in search result. Teams cuts long first
+    # names with ellipses, which are removed.
+    praised_first_name = text_value.split()[0].partition("...")[0]
+
+    # Praise text value after "got praise!" string
+    text_value = text_value.split(GOT_PRAISE)[1]
+    text_value = text_value.split(" {}".format(praised_first_name))[0]
+
+    return praised_first_name, text_value[0:praise_text_length(text_value, praised_first_name)]
+
+
+def is_truncated(name):
+    """
+    :param name: string name from search result snippet
+    :return: boolean True if Teams cut name off with ellipses
+    """
+    return name.endswith("...") or name.endswith(u"\u2026")
+
+
+def split_praised_names(text_value, praised_first_name):
+    """
+    Get names of everyone praised from end of search result snippet,
+    e.g. "Bob got praise! Great work Bob Smith, Ann Lee". Long names
+    may be cut off with ellipses, checked using is_truncated.
+    :param text_value: string search result snippet
+    :param praised_first_name: string first name from split_praise_text
+    :return: list of names, or None if names not found or snippet
+        cut off by ellipses after last name shown
+    """
+    if not is_praise_text(text_value) or not praised_first_name:
+        return None
+    text_value = text_value.split(GOT_PRAISE, 1)[1]
+    index = text_value.find(u" " + praised_first_name)
+    if index < 0:
+        return None
+    names = [name.strip() for name in text_value[index + 1:].split(", ") if name.strip()]
+    # Snippet cut off at end may have left out more names
+    if not names or is_truncated(names[-1]):
+        return None
+    return names
+
+
+class Node(object):
+    """
+    Node is an element of a parsed snapshot. Children are nodes and
+    unicode text in document order.
+    """
+
+    __slots__ = ["tag", "attributes", "children", "parent"]
+
+    def __init__(self, tag, attributes, parent):
+        self.tag = tag
+        self.attributes = attributes
+        self.children = []
+        self.parent = parent
+
+    def has_class(self, name):
+        return name in self.attributes.get("class", "").split()
+
+    def find(self, match):
+        """
+        :param match: function given node
+        :return: first descendant node matched, None if none
+        """
+        for node in self.iter():
+            if match(node):
+                return node
+        return None
+
+    def iter(self):
+        """
+        :return: generator of descendant nodes in document order
+        """
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Node):
+                yield node
+                stack.extend(reversed(node.children))
+
+    def text(self):
+        """
+        :return: unicode text of node with whitespace collapsed, as
+            returned by Selenium
+        """
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Node):
+                if node.tag in BLOCK_TAGS:
+                    parts.append(u" ")
+                    stack.append(u" ")
+                stack.extend(reversed(node.children))
+            else:
+                parts.append(node)
+        return u" ".join(u"".join(parts).split())
+
+
+class SnapshotParser(HTMLParser):
+    """
+    SnapshotParser builds a tree of nodes from a page source snapshot.
+    Teams markup is not always well formed, so end tags close the
+    nearest open element with the same tag and stray end tags are
+    ignored.
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.root = Node("document", {}, None)
+        self._open = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, dict((name, value or "") for name, value in attrs), self._open[-1])
+        self._open[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self._open.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open[-1].children.append(
+            Node(tag, dict((name, value or "") for name, value in attrs), self._open[-1]))
+
+    def handle_endtag(self, tag):
+        for index in range(len(self._open) - 1, 0, -1):
+            if self._open[index].tag == tag:
+                del self._open[index:]
+                return
+
+    def handle_data(self, data):
+        self._open[-1].children.append(data)
+
+    def handle_entityref(self, name):
+        self._open[-1].children.append(self.unescape("&{};".format(name)))
+
+    def handle_charref(self, name):
+        self._open[-1].children.append(self.unescape("&#{};".format(name)))
+
+
+def parse_tree(page_source):
+    """
+    :param page_source: unicode page source
+    :return: root Node of snapshot
+    """
+    parser = SnapshotParser()
+    parser.feed(page_source)
+    parser.close()
+    return parser.root
+
+
+def is_timestamp(node):
+    return node.tag == "span" and node.attributes.get("data-tid") == "messageTimeStamp"
+
+
+def first_timestamps(root):
+    """
+    Find first message timestamp inside every node in one pass.
+    :param root: root Node of snapshot
+    :return: dictionary of timestamp Node keyed by id of node
+        containing it. Nodes without timestamp left out.
+    """
+    timestamps = {}
+    for node in reversed(list(root.iter())):
+        if is_timestamp(node):
+            timestamps[id(node)] = node
+            continue
+        for child in node.children:
+            if isinstance(child, Node) and id(child) in timestamps:
+                timestamps[id(node)] = timestamps[id(child)]
+                break
+    return timestamps
+
+
+def parse_cards(root):
+    """
+    Get praises from praise cards in snapshot. Same rules as praise
+    observer: praiser in first text block of card, praised in third,
+    time in nearest message timestamp containing card.
+    :param root: root Node of snapshot
+    :return: list of (time, praiser, praised) tuples
+    """
+    praises = []
+    seen = set()
+    timestamps = None
+
+    # Praise label check of each message, by id of message node
+    is_praise = {}
+
+    for card in root.iter():
+        if card.tag != "div" or not card.has_class("card-body"):
+            continue
+        blocks = [block for container in card.iter()
+                  if container.tag == "div" and container.has_class("ac-container")
+                  for block in container.children
+                  if isinstance(block, Node) and block.tag == "div" and block.has_class("ac-textBlock")]
+        if len(blocks) < 3:
+            continue
+
+        if timestamps is None:
+            timestamps = first_timestamps(root)
+        message = card.parent
+        while message is not None and id(message) not in timestamps:
+            message = message.parent
+        if message is None:
+            continue
+        if id(message) not in is_praise:
+            is_praise[id(message)] = "Praise" in message.text()
+        if not is_praise[id(message)]:
+            continue
+
+        praiser = blocks[0].find(lambda node: node.tag == "p")
+        praised = blocks[2].find(lambda node: node.tag == "p")
+        praise = (
+            timestamps[id(message)].attributes.get("title", ""),
+            praiser.text() if praiser is not None else u"",
+            praised.text() if praised is not None else u"",
+        )
+        if all(praise) and praise not in seen:
+            seen.add(praise)
+            praises.append(praise)
+    return praises
+
+
+def parse_search_results(root):
+    """
+    Get praise snippets from search results panel in snapshot.
+    :param root: root Node of snapshot
+    :return: list of (praiser, praised first name, praise text)
+        tuples of search results that are praises
+    """
+    snippets = []
+    content = root.find(lambda node: node.tag == "div" and node.has_class("search-content"))
+    if content is None:
+        return snippets
+    for result in content.children:
+        if not isinstance(result, Node) or result.tag != "div":
+            continue
+        name = result.find(lambda node: node.tag == "span" and node.has_class("user-name"))
+        body = result.find(lambda node: node.tag == "div" and node.has_class("search-chat-body"))
+        if name is None or body is None:
+            continue
+        split = split_praise_text(body.text())
+        if split is not None:
+            snippets.append((name.text(),) + split)
+    return snippets
+
+
+def parse_snapshot(page_source):
+    """
+    Parse page source snapshot saved by bot.
+    :param page_source: unicode page source
+    :return: tuple of list of praises and list of snippets
+    """
+    root = parse_tree(page_source)
+    return parse_cards(root), parse_search_results(root)
+
+
+def parse_snapshot_file(path):
+    """
+    Parse snapshot file. Used by worker processes.
+    :param path: string filepath of UTF-8 HTML snapshot
+    :return: tuple of list of praises and list of snippets
+    """
+    with codecs.open(path, "r", "utf-8") as snapshot_file:
+        return parse_snapshot(snapshot_file.read())
+
+
+def parse_directory(directory, processes=None):
+    """
+    Parse every snapshot in directory using worker processes.
+    :param directory: string directory containing .html snapshots
+    :param processes: integer worker processes, CPU count if None
+    :return: tuple of number of snapshots parsed, list of distinct
+        praises and list of distinct snippets, both ordered by first
+        snapshot found in
+    """
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".html"))
+    if not paths:
+        return 0, [], []
+
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(parse_snapshot_file, paths, chunksize=max(1, len(paths) // (4 * processes)))
+    finally:
+        pool.close()
+        pool.join()
+
+    praises = []
+    snippets = []
+    seen = set()
+    for snapshot_praises, snapshot_snippets in results:
+        for praise in snapshot_praises:
+            if praise not in seen:
+                seen.add(praise)
+                praises.append(praise)
+        for snippet in snapshot_snippets:
+            if snippet not in seen:
+                seen.add(snippet)
+                snippets.append(snippet)
+    return len(paths), praises, snippets
+
+
+def praise_rows(praises, people):
+    """
+    Split praises given to multiple people into one row per person,
+    as bot adds them. Names replaced with canonical full names.
+    :param praises: list of (time, praiser, praised) tuples
+    :param people: PeopleDirectory used to resolve names
+    :return: list of [time, praiser, praised] lists
+    """
+    return [[time_value, people.canonical(praiser_name), people.canonical(name)]
+            for time_value, praiser_name, praised_name in praises
+            for name in praised_name.split(", ")]
+
+
+def write_csv(path, header, rows):
+    """
+    :param path: string output CSV filepath
+    :param header: list of column names
+    :param rows: iterable of unicode tuples
+    """
+    with open(path, "wb") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([value.encode("utf-8") for value in row])
+
+
+def main():
+    """
+    Extract praises from page source snapshots saved by bot.
+    """
+    parser = argparse.ArgumentParser(description="Parse Praise Counter page snapshots")
+    parser.add_argument("directory", help="Snapshot directory")
+    parser.add_argument("output", help="Output CSV filepath")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes, CPU count by default")
+    parser.add_argument("--snippets", default=None,
+                        help="Output CSV filepath of praise search result snippets")
+    parser.add_argument("--server-base", default=None, help="Url of praise server praises are uploaded to")
+    parser.add_argument("--secret-key", default="")
+    arguments = parser.parse_args()
+
+    count, praises, snippets = parse_directory(arguments.directory, arguments.processes)
+    write_csv(arguments.output, ["time", "praiser", "praised"], praises)
+    print "{} praises found in {} snapshots".format(len(praises), count)
+
+    if arguments.snippets:
+        write_csv(arguments.snippets, ["praiser", "praised first name", "text"], snippets)
+        print "{} praise snippets found".format(len(snippets))
+
+    if arguments.server_base:
+        reconciler = Reconciler(None, arguments.server_base, arguments.secret_key)
+        rows = praise_rows(praises, PeopleDirectory())
+        added = reconciler.post_praises(rows)
+        print "{} praises added to server, {} duplicates".format(added, len(rows) - added)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+from history import PraiseHistory, wall_time, format_time_value, bucket_digests
+import argparse
+import requests
+import json
+import time
+
+
+class Reconciler(object):
+    """
+    Reconciler finds praises in local history missing from server
+    database without checking praises one by one. Client and server
+    hash praise keys per day. Days with different hashes are hashed
+    again per hour, and only hours that still differ have their keys
+    fetched. Requests needed grow with number of differences, not
+    length of history. Missing praises uploaded in bulk.
+    """
+
+    # Bucket lengths in seconds, largest first. Differing buckets of
+    # each level split into buckets of the next level.
+    BUCKET_SECONDS = [24 * 60 * 60, 60 * 60]
+
+    def __init__(self, history, server_base, secret_key):
+        # Local praise history compared against server
+        self.history = history
+
+        # Url of server and secret key allowing access
+        self.server_base = server_base
+        self.secret_key = secret_key
+
+        # Seconds to wait for server, and praises per bulk upload
+        self.timeout_seconds = 30
+        self.batch_size = 200
+
+        # Number of server requests made by last reconcile
+        self.request_count = 0
+
+    def request(self, script, parameters):
+        """
+        Send GET request to server.
+        :return: JSON decoded response
+        """
+        parameters = dict(parameters, s=self.secret_key)
+        r = requests.get(self.server_base + script, params=parameters,
+                         headers={"User-Agent": "Chrome"}, timeout=self.timeout_seconds)
+        self.request_count += 1
+        r.raise_for_status()
+        return json.loads(r.content)
+
+    def local_keys(self, start, end):
+        """
+        Get keys of local praises in wall time range.
+        :param start: integer wall time, inclusive
+        :param end: integer wall time, exclusive
+        :return: dictionary of epoch seconds keyed by praise key
+        """
+        keys = {}
+        # Range widened by a day so praises in any time zone found
+        for epoch, praiser_name, praised_name in self.history.query(start - 86400, end + 86400):
+            praise_wall_time = wall_time(epoch)
+            if start <= praise_wall_time < end:
+                keys[(praise_wall_time, praiser_name, praised_name)] = epoch
+        return keys
+
+    def differing_buckets(self, start, end, bucket_seconds):
+        """
+        Compare local and server digests of range.
+        :return: list of start of buckets that differ
+        """
+        local = bucket_digests(self.local_keys(start, end), start, bucket_seconds)
+        server = self.request("digest.php", {"start": start, "end": end, "size": bucket_seconds})
+        server = dict((int(bucket), digest) for bucket, digest in server.items())
+        return sorted(bucket for bucket in set(local) | set(server) if local.get(bucket) != server.get(bucket))
+
+    def differences(self, start, end):
+        """
+        Find praises only in local history and only on server.
+        :param start: integer wall time, inclusive
+        :param end: integer wall time, exclusive
+        :return: tuple of dictionary of epoch keyed by praise key
+            missing on server, and list of praise keys missing locally
+        """
+        ranges = [(start, end)]
+        for bucket_seconds in self.BUCKET_SECONDS:
+            ranges = [(bucket, min(bucket + bucket_seconds, range_end))
+                      for range_start, range_end in ranges
+                      for bucket in self.differing_buckets(range_start, range_end, bucket_seconds)]
+
+        missing = {}
+        extra = []
+        for range_start, range_end in ranges:
+            local = self.local_keys(range_start, range_end)
+            server = set(tuple(key) for key in self.request("keys.php", {"start": range_start, "end": range_end}))
+            missing.update((key, epoch) for key, epoch in local.items() if key not in server)
+            extra.extend(key for key in server if key not in local)
+        return missing, extra
+
+    def upload(self, missing):
+        """
+        Add praises missing from server database.
+        :param missing: dictionary of epoch keyed by praise key
+        :return: integer number of praises added
+        """
+        return self.post_praises([[format_time_value(epoch), praiser_name, praised_name]
+                                  for (_, praiser_name, praised_name), epoch in sorted(missing.items())])
+
+    def post_praises(self, praises):
+        """
+        Add praises to server database in batches using add_praises.php.
+        :param praises: list of [time, praiser, praised] lists
+        :return: integer number of praises added
+        """
+        added = 0
+        for index in range(0, len(praises), self.batch_size):
+            r = requests.post(
+                self.server_base + "add_praises.php", params={"s": self.secret_key},
+                data=json.dumps(praises[index:index + self.batch_size]),
+                headers={"User-Agent": "Chrome", "Content-Type": "application/json"},
+                timeout=self.timeout_seconds)
+            self.request_count += 1
+            r.raise_for_status()
+            added += r.content.split(",").count("1")
+        return added
+
+    def reconcile(self, start, end):
+        """
+        Upload local praises missing from server.
+        :param start: integer wall time, inclusive
+        :param end: integer wall time, exclusive
+        :return: tuple of number of praises added to server and
+            number of server praises not in local history
+        """
+        self.request_count = 0
+        missing, extra = self.differences(start, end)
+        return self.upload(missing), len(extra)
+
+
+def main():
+    """
+    Reconcile praise history with local praise server.
+    """
+    parser = argparse.ArgumentParser(description="Upload praise history missing from praise server")
+    parser.add_argument("directory", help="History directory")
+    parser.add_argument("--server-base", required=True, help="Url of local praise server")
+    parser.add_argument("--secret-key", default="")
+    parser.add_argument("--start", default=None, help="First day reconciled, YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="Day after last day reconciled, YYYY-MM-DD")
+    arguments = parser.parse_args()
+
+    # Days read as UTC so range is in wall time
+    day_seconds = Reconciler.BUCKET_SECONDS[0]
+    start = wall_time(time.time()) // day_seconds * day_seconds - 30 * day_seconds
+    end = start + 31 * day_seconds
+    if arguments.start:
+        start = wall_time(time.mktime(time.strptime(arguments.start, "%Y-%m-%d")))
+    if arguments.end:
+        end = wall_time(time.mktime(time.strptime(arguments.end, "%Y-%m-%d")))
+
+    history = PraiseHistory(arguments.directory)
+    reconciler = Reconciler(history, arguments.server_base, arguments.secret_key)
+    added, extra = reconciler.reconcile(start, end)
+    history.close()
+    print "{} praises added to server, {} praises on server not in history, {} requests".format(
+        added, extra, reconciler.request_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import random
+import time
+
+
+class TransientError(Exception):
+    """
+    Raised by an operation for a failure worth retrying that is
+    not already an exception, e.g. web server error status code.
+    """
+    pass
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an operation while its circuit
+    breaker is open because the dependency is considered down.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    CircuitBreaker stops calls to a dependency after too many
+    consecutive failures. After 'reset_seconds' one trial call is
+    allowed. Success closes circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=60):
+        # Name of dependency shown in logs
+        self.name = name
+
+        # Consecutive failures that open circuit
+        self.failure_threshold = failure_threshold
+
+        # Seconds circuit stays open before a trial call is allowed
+        self.reset_seconds = reset_seconds
+
+        # Consecutive failures since last success
+        self.failures = 0
+
+        # Time circuit opened. None if closed.
+        self._opened = None
+
+        # Breaker shared by bot and uploader threads
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """
+        :return: boolean True if calls currently not allowed
+        """
+        with self._lock:
+            return self._opened is not None and time.time() - self._opened < self.reset_seconds
+
+    def remaining_seconds(self):
+        """
+        :return: float seconds until trial call allowed, 0 if closed
+        """
+        with self._lock:
+            if self._opened is None:
+                return 0
+            return max(0, self.reset_seconds - (time.time() - self._opened))
+
+    def allow(self):
+        """
+        Check if call allowed. Once circuit has been open for
+        'reset_seconds', one trial call allowed and circuit stays
+        open for other calls until trial call result recorded.
+        :return: boolean True if call allowed
+        """
+        with self._lock:
+            if self._opened is None:
+                return True
+            if time.time() - self._opened < self.reset_seconds:
+                return False
+            # Restart open period so only this call is a trial
+            self._opened = time.time()
+            return True
+
+    def success(self):
+        """
+        Record successful call. Closes circuit.
+        """
+        with self._lock:
+            self.failures = 0
+            self._opened = None
+
+    def failure(self):
+        """
+        Record failed call. Opens circuit if threshold reached.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._opened = time.time()
+
+
+class RetryPolicy(object):
+    """
+    RetryPolicy retries failed operations with jittered exponential
+    backoff. Retries end when 'attempts' calls have been made or
+    the next wait would exceed 'budget_seconds' since first call.
+    """
+
+    def __init__(self, attempts=3, base_seconds=1.0, max_seconds=30.0, budget_seconds=60.0):
+        # Max number of calls including first call
+        self.attempts = attempts
+
+        # Wait before first retry. Doubles each retry up to max.
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+
+        # Max total seconds spent on one operation including waits
+        self.budget_seconds = budget_seconds
+
+    def delay(self, retry):
+        """
+        Get wait before retry. Random jitter keeps instances from
+        retrying at the same time.
+        :param retry: integer number of retries already made
+        :return: float seconds to wait
+        """
+        limit = min(self.max_seconds, self.base_seconds * 2 ** retry)
+        return random.uniform(limit / 2, limit)
+
+    def next_delay(self, retry, started):
+        """
+        Get wait before next retry, or None if retries exhausted.
+        Used by retry loops that cannot be written as one call.
+        :param retry: integer number of retries already made
+        :param started: float time first call was made
+        :return: float seconds to wait or None if no retry allowed
+        """
+        if retry + 1 >= self.attempts:
+            return None
+        delay = self.delay(retry)
+        if time.time() - started + delay > self.budget_seconds:
+            return None
+        return delay
+
+    def call(self, function, retry_on=(Exception,), breaker=None, is_running=None, on_retry=None):
+        """
+        Call function, retrying on given exceptions.
+        :param function: callable with no arguments
+        :param retry_on: tuple of exception classes worth retrying
+        :param breaker: CircuitBreaker of dependency or None
+        :param is_running: callable returning False to stop retrying
+        :param on_retry: callable given exception and wait seconds
+            before each retry. Used to log retries.
+        :return: result of function
+        :raises CircuitOpenError: if breaker does not allow call
+        :raises: last exception if retries exhausted
+        """
+        started = time.time()
+        retry = 0
+
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(breaker.name)
+
+            try:
+                result = function()
+            except retry_on as exception:
+                if breaker is not None:
+                    breaker.failure()
+                delay = self.next_delay(retry, started)
+                retry += 1
+                if delay is None or \
+                        (is_running is not None and not is_running()) or \
+                        (breaker is not None and breaker.is_open()):
+                    raise
+                if on_retry is not None:
+                    on_retry(exception, delay)
+                time.sleep(delay)
+                continue
+
+            if breaker is not None:
+                breaker.success()
+            return result
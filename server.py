@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from history import parse_time_value, wall_time, bucket_digests
+import urlparse
+import threading
+import argparse
+import sqlite3
+import json
+import time
+
+
+class PraiseDatabase(object):
+    """
+    PraiseDatabase stores praises in SQLite. Each request thread
+    uses its own connection. Database runs in WAL mode so readers
+    do not block the writer, and writers wait on each other using
+    the busy timeout instead of failing when the database is locked.
+    """
+
+    def __init__(self, path):
+        # Filepath of SQLite database. Created if missing.
+        self.path = path
+
+        # Seconds a writer waits for the database lock
+        self.busy_timeout_seconds = 30
+
+        # Connection per thread. SQLite connections cannot be
+        # shared between threads.
+        self._local = threading.local()
+
+        self.create_schema()
+
+    def connect(self):
+        """
+        Get connection for current thread, opening one if needed.
+        :return: sqlite3 connection
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def create_schema(self):
+        """
+        Create tables and indexes if they do not already exist.
+        Unique index on praise makes duplicate check part of insert.
+        Wall time of praises added before wall time column existed
+        filled in so reconciliation can query praises by time.
+        """
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS praise ("
+                "id INTEGER PRIMARY KEY, "
+                "time_value TEXT NOT NULL, "
+                "praiser TEXT NOT NULL, "
+                "praised TEXT NOT NULL, "
+                "added TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+            connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS praise_unique ON praise (time_value, praiser, praised)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS praise_praised ON praise (praised)")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(praise)")]
+            if "wall_time" not in columns:
+                connection.execute("ALTER TABLE praise ADD COLUMN wall_time INTEGER")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS praise_wall_time ON praise (wall_time)")
+            rows = connection.execute("SELECT id, time_value FROM praise WHERE wall_time IS NULL").fetchall()
+            for praise_id, time_value in rows:
+                praise_wall_time = self.parse_wall_time(time_value)
+                if praise_wall_time is not None:
+                    connection.execute("UPDATE praise SET wall_time = ? WHERE id = ?", (praise_wall_time, praise_id))
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS refresh ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), "
+                "updated TEXT NOT NULL)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS lease ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), "
+                "owner TEXT NOT NULL, "
+                "expires REAL NOT NULL)")
+
+    @staticmethod
+    def parse_wall_time(time_value):
+        """
+        :param time_value: string time of praise
+        :return: integer wall time seconds or None if format unknown
+        """
+        epoch = parse_time_value(time_value)
+        if epoch is None:
+            return None
+        return wall_time(epoch)
+
+    @classmethod
+    def insert_praise(cls, connection, time_value, praiser_name, praised_name):
+        """
+        Insert praise using given connection. Caller handles commit.
+        Same praise sent with time in another format, e.g. Teams
+        timestamp by bot and history format by reconciliation, is a
+        duplicate of the same wall time, praiser and praised.
+        :return: string "1" if praise added, "2" if duplicate found
+        """
+        praise_wall_time = cls.parse_wall_time(time_value)
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO praise (time_value, praiser, praised, wall_time) "
+            "SELECT ?, ?, ?, ? WHERE ? IS NULL OR NOT EXISTS ("
+            "SELECT 1 FROM praise WHERE wall_time = ? AND praiser = ? AND praised = ?)",
+            (time_value, praiser_name, praised_name, praise_wall_time,
+             praise_wall_time, praise_wall_time, praiser_name, praised_name))
+        if cursor.rowcount == 1:
+            return "1"
+        return "2"
+
+    def add_praise(self, time_value, praiser_name, praised_name):
+        """
+        Add praise to database.
+        :param time_value: string time of praise
+        :param praiser_name: string first and last name of praiser
+        :param praised_name: string first and last name of praised
+        :return: string "1" if praise added, "2" if duplicate found
+        """
+        connection = self.connect()
+        with connection:
+            return self.insert_praise(connection, time_value, praiser_name, praised_name)
+
+    def add_praises(self, praises):
+        """
+        Add many praises in a single transaction.
+        :param praises: list of (time, praiser, praised) tuples
+        :return: list of string results, "1" added and "2" duplicate
+        """
+        connection = self.connect()
+        with connection:
+            return [self.insert_praise(connection, *praise) for praise in praises]
+
+    def update_time(self):
+        """
+        Set last refresh time to current time.
+        """
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO refresh (id, updated) VALUES (1, CURRENT_TIMESTAMP)")
+
+    def praise_keys(self, start, end):
+        """
+        Get keys of praises in wall time range.
+        :param start: integer wall time, inclusive
+        :param end: integer wall time, exclusive
+        :return: list of (wall time, praiser, praised) tuples
+        """
+        connection = self.connect()
+        return connection.execute(
+            "SELECT wall_time, praiser, praised FROM praise WHERE wall_time >= ? AND wall_time < ?",
+            (start, end)).fetchall()
+
+    def digests(self, start, end, bucket_seconds):
+        """
+        Hash praise keys per bucket of wall time range.
+        :return: dictionary of [count, digest] keyed by bucket start
+        """
+        return bucket_digests(self.praise_keys(start, end), start, bucket_seconds)
+
+    def update_lease(self, owner, ttl_seconds):
+        """
+        Acquire, renew or release scraping lease. Lease granted if
+        free, expired, or already held by owner.
+        :param owner: string unique name of bot instance
+        :param ttl_seconds: float seconds lease valid, 0 releases lease
+        :return: string "1" if owner holds lease, otherwise "0"
+        """
+        connection = self.connect()
+        now = time.time()
+        with connection:
+            # Write lock taken before read so two bots cannot both
+            # see lease as free
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT owner, expires FROM lease WHERE id = 1").fetchone()
+            held = row is not None and row[0] != owner and row[1] > now
+            if held:
+                return "0"
+            if ttl_seconds <= 0:
+                connection.execute("DELETE FROM lease WHERE id = 1")
+                return "0"
+            connection.execute(
+                "INSERT OR REPLACE INTO lease (id, owner, expires) VALUES (1, ?, ?)", (owner, now + ttl_seconds))
+            return "1"
+
+
+class PraiseRequestHandler(BaseHTTPRequestHandler):
+    """
+    PraiseRequestHandler implements the scripts used by bot.
+    Script names match the PHP scripts on the original web
+    server so bot only needs a different server base url.
+    """
+
+    def parameters(self):
+        """
+        :return: dictionary of query string parameters as unicode
+        """
+        query = urlparse.urlparse(self.path).query
+        return dict((key, values[0].decode("utf-8"))
+                    for key, values in urlparse.parse_qs(query, keep_blank_values=True).items())
+
+    def script(self):
+        """
+        :return: string script name requested, e.g. add_praise.php
+        """
+        return urlparse.urlparse(self.path).path.rsplit("/", 1)[-1]
+
+    def respond(self, status, content):
+        """
+        Send plain text response.
+        :param status: integer http status code
+        :param content: string response body
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def authorized(self, parameters):
+        """
+        Check secret key sent by bot. Any key accepted if server
+        started without a secret key.
+        :return: boolean True if request allowed
+        """
+        secret_key = self.server.secret_key
+        return not secret_key or parameters.get("s") == secret_key
+
+    def do_GET(self):
+        parameters = self.parameters()
+        if not self.authorized(parameters):
+            self.respond(403, "0")
+            return
+
+        database = self.server.database
+        script = self.script()
+
+        if script == "add_praise.php":
+            try:
+                result = database.add_praise(parameters["t"], parameters["r"], parameters["d"])
+            except KeyError:
+                self.respond(400, "0")
+                return
+            self.respond(200, result)
+        elif script == "update_time.php":
+            database.update_time()
+            # Bot using a lease renews it with refresh time update
+            if "o" in parameters:
+                self.respond(200, self.lease(parameters))
+            else:
+                self.respond(200, "1")
+        elif script == "lease.php":
+            self.respond(200, self.lease(parameters))
+        elif script in ("digest.php", "keys.php"):
+            try:
+                start, end = int(parameters["start"]), int(parameters["end"])
+                if script == "digest.php":
+                    result = database.digests(start, end, int(parameters["size"]))
+                else:
+                    result = database.praise_keys(start, end)
+            except (KeyError, ValueError, ZeroDivisionError):
+                self.respond(400, "0")
+                return
+            self.respond(200, json.dumps(result))
+        else:
+            self.respond(404, "0")
+
+    def lease(self, parameters):
+        """
+        Update lease using owner and lease length parameters.
+        :return: string "1" if owner holds lease, otherwise "0"
+        """
+        try:
+            return self.server.database.update_lease(parameters["o"], float(parameters.get("l", 0)))
+        except (KeyError, ValueError):
+            return "0"
+
+    def do_POST(self):
+        """
+        Bulk variant of add_praise.php. Body is a JSON list of
+        [time, praiser, praised] lists. Response is a comma
+        separated list of results in the same order.
+        """
+        parameters = self.parameters()
+        if not self.authorized(parameters):
+            self.respond(403, "0")
+            return
+
+        if self.script() != "add_praises.php":
+            self.respond(404, "0")
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.getheader("Content-Length", 0)))
+            praises = [(praise[0], praise[1], praise[2]) for praise in json.loads(body)]
+        except (ValueError, TypeError, IndexError):
+            self.respond(400, "0")
+            return
+
+        results = self.server.database.add_praises(praises)
+        self.respond(200, ",".join(results))
+
+
+class PraiseServer(ThreadingMixIn, HTTPServer):
+    """
+    PraiseServer handles each request in its own thread so many
+    bots can write at once. Database writes serialized by SQLite.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, database, secret_key=""):
+        HTTPServer.__init__(self, address, PraiseRequestHandler)
+
+        # PraiseDatabase shared by request threads
+        self.database = database
+
+        # Secret key required from bots. Empty allows any key.
+        self.secret_key = secret_key
+
+
+def main():
+    """
+    Run local praise server. Bot uses server when started with
+    --server-base http://HOST:PORT/
+    """
+    parser = argparse.ArgumentParser(description="Local Praise Counter server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--database", default="praise.db")
+    parser.add_argument("--secret-key", default="")
+    arguments = parser.parse_args()
+
+    server = PraiseServer(
+        (arguments.host, arguments.port), PraiseDatabase(arguments.database), arguments.secret_key)
+    print "Serving praise server on http://{}:{}/".format(arguments.host, arguments.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from selenium.common.exceptions import InvalidSelectorException, NoSuchElementException
+from locators import LocatorRegistry
+from waits import AdaptiveWait
+import unittest
+
+
+class InvalidXPathDriver(object):
+    """
+    Driver rejecting every CSS and XPath locator the way Selenium 3
+    does, with the locator value quoted in the message. Scripts find
+    the element.
+    """
+
+    def find_element(self, by, value):
+        raise InvalidSelectorException(u"invalid selector: Unable to locate an element with the xpath "
+                                       u"expression {} because of the following error".format(value))
+
+    def find_elements(self, by, value):
+        self.find_element(by, value)
+
+    def execute_script(self, script, context, values):
+        return "card"
+
+
+class LocatorRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        driver = InvalidXPathDriver()
+        self.locators = LocatorRegistry(driver, AdaptiveWait(driver, maximum_seconds=1))
+
+    def test_invalid_locator_with_non_ascii_value_falls_back(self):
+        card = self.locators.find("praise_card", praiser=u"Ann Lee", praised=u"Bob", text=u"Bob's café")
+        self.assertEqual(card, "card")
+
+    def test_invalid_locator_demoted_once(self):
+        self.locators.find("praise_card", praiser=u"Ann O'Brien", praised=u"Bob", text=u"Great work")
+        self.assertEqual([(strategy.name, strategy.reliability()) for strategy in self.locators.ranked("praise_card")],
+                         [("praise_card#1", 1.0), ("praise_card#0", 0.5)])
+
+    def test_missing_element_not_demoted(self):
+        class EmptyDriver(InvalidXPathDriver):
+            def find_element(self, by, value):
+                raise NoSuchElementException("not found")
+
+            def find_elements(self, by, value):
+                return []
+
+            def execute_script(self, script, context, values):
+                return None
+
+        driver = EmptyDriver()
+        locators = LocatorRegistry(driver, AdaptiveWait(driver, maximum_seconds=0.2))
+        self.assertRaises(NoSuchElementException, locators.find, "search_input")
+        self.assertEqual([strategy.reliability() for strategy in locators.ranked("search_input")], [1.0, 1.0, 1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from people import PeopleDirectory
+import tempfile
+import unittest
+import shutil
+import os
+
+
+class PeopleDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.people = PeopleDirectory(os.path.join(self.directory, "people.json"))
+        for name in [u"Bob Smith", u"Alice Wong", u"Bartholomew Fox"]:
+            self.people.learn(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_one_word_name_not_rewritten(self):
+        self.assertEqual(self.people.canonical(u"Bob"), u"Bob")
+        self.assertEqual(self.people.canonical(u"Al"), u"Al")
+
+    def test_marked_for_deletion_resolves(self):
+        self.assertEqual(self.people.canonical(u"bob smith [Marked for deletion]"), u"Bob Smith")
+
+    def test_truncated_name_resolves_by_unique_prefix(self):
+        self.assertEqual(self.people.resolve_truncated(u"Barth..."), u"Bartholomew Fox")
+        self.assertIsNone(self.people.resolve_truncated(u"B..."))
+
+
+if __name__ == '__main__':
+    unittest.main()
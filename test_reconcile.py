@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from history import PraiseHistory, parse_time_value
+from server import PraiseDatabase, PraiseServer
+from reconcile import Reconciler
+import threading
+import calendar
+import tempfile
+import unittest
+import shutil
+import os
+
+
+# Praise time as shown in Teams message timestamp title
+TEAMS_TIME = "Monday, January 06, 2020 10:15 AM"
+
+
+class ReconcileRoundTripTest(unittest.TestCase):
+    """
+    Praises uploaded by reconciliation use history time format. Bot
+    adding the same praise with Teams time must find a duplicate.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history = PraiseHistory(os.path.join(self.directory, "history"))
+        self.database = PraiseDatabase(os.path.join(self.directory, "praise.db"))
+        self.server = PraiseServer(("127.0.0.1", 0), self.database)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        server_base = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+        self.reconciler = Reconciler(self.history, server_base, "")
+
+        # January 2020 in wall time
+        self.start = calendar.timegm((2020, 1, 1, 0, 0, 0))
+        self.end = calendar.timegm((2020, 2, 1, 0, 0, 0))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.history.close()
+        shutil.rmtree(self.directory)
+
+    def praise_count(self):
+        return self.database.connect().execute("SELECT COUNT(*) FROM praise").fetchone()[0]
+
+    def test_reconciled_praise_not_added_again_by_bot(self):
+        self.history.append(parse_time_value(TEAMS_TIME), u"Ann Lee", u"Bob Smith")
+        self.assertEqual(self.reconciler.reconcile(self.start, self.end), (1, 0))
+
+        self.assertEqual(self.database.add_praise(TEAMS_TIME, u"Ann Lee", u"Bob Smith"), "2")
+        self.assertEqual(self.praise_count(), 1)
+
+        # Nothing left to upload, and digests match so no keys fetched
+        self.assertEqual(self.reconciler.reconcile(self.start, self.end), (0, 0))
+        self.assertEqual(self.reconciler.request_count, 1)
+
+    def test_praise_added_by_bot_not_uploaded(self):
+        self.assertEqual(self.database.add_praise(TEAMS_TIME, u"Ann Lee", u"Bob Smith"), "1")
+        self.history.append(parse_time_value(TEAMS_TIME), u"Ann Lee", u"Bob Smith")
+
+        self.assertEqual(self.reconciler.reconcile(self.start, self.end), (0, 0))
+        self.assertEqual(self.praise_count(), 1)
+
+    def test_different_praisers_at_same_time_kept(self):
+        self.assertEqual(self.database.add_praise(TEAMS_TIME, u"Ann Lee", u"Bob Smith"), "1")
+        self.assertEqual(self.database.add_praise(TEAMS_TIME, u"Cid Moe", u"Bob Smith"), "1")
+        self.assertEqual(self.praise_count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
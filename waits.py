@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from collections import deque
+import time
+import math
+
+
+class AdaptiveWait(object):
+    """
+    AdaptiveWait replaces the global implicit wait with explicit
+    waits per locator. Time taken for each locator to be found is
+    recorded and the timeout used for that locator is learned from
+    the slowest recent lookups. Lookups expected to fail time out
+    after the learned timeout instead of the full maximum wait.
+    Timeouts are recorded as well, so a timeout learned while page
+    was fast grows again when page slows down.
+    """
+
+    def __init__(self, driver, maximum_seconds=10):
+        # Selenium driver used to find elements
+        self.driver = driver
+
+        # Timeout used until enough lookups recorded, and upper
+        # limit for learned timeouts
+        self.maximum_seconds = maximum_seconds
+
+        # Learned timeout never lower than '_minimum_seconds'
+        self._minimum_seconds = 0.5
+
+        # Learned timeout is the '_percentile' latency of the last
+        # '_sample_size' lookups plus '_margin_seconds'. Learned
+        # timeout used after '_minimum_samples' lookups recorded.
+        self._percentile = 0.95
+        self._margin_seconds = 0.5
+        self._sample_size = 50
+        self._minimum_samples = 5
+
+        # Seconds between attempts while waiting for element
+        self._poll_seconds = 0.1
+
+        # Recent latencies in seconds keyed by locator name
+        self._latencies = {}
+
+    def timeout(self, name):
+        """
+        Get timeout for locator using recorded latencies.
+        :param name: string name of locator
+        :return: float timeout in seconds
+        """
+        latencies = self._latencies.get(name)
+        if latencies is None or len(latencies) < self._minimum_samples:
+            return self.maximum_seconds
+        ordered = sorted(latencies)
+        index = int(math.ceil(self._percentile * len(ordered))) - 1
+        timeout = ordered[index] + self._margin_seconds
+        return min(self.maximum_seconds, max(self._minimum_seconds, timeout))
+
+    def record(self, name, seconds):
+        """
+        Record time taken to find element.
+        :param name: string name of locator
+        :param seconds: float latency in seconds
+        """
+        if name not in self._latencies:
+            self._latencies[name] = deque(maxlen=self._sample_size)
+        self._latencies[name].append(seconds)
+
+    def latency(self, name):
+        """
+        :param name: string name of locator
+        :return: float mean recorded latency in seconds, None if no lookups recorded
+        """
+        latencies = self._latencies.get(name)
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def find(self, name, by, value, context=None):
+        """
+        Wait for element using learned timeout for locator.
+        :param name: string name of locator used to learn timeout
+        :param by: string selenium By strategy
+        :param value: string locator value
+        :param context: element searched from, driver if None
+        :return: element found
+        :raises NoSuchElementException: if element not found in time
+        """
+        return self.until(name, lambda searched: searched.find_element(by, value), context)
+
+    def until(self, name, locate, context=None):
+        """
+        Wait for element found by any locate function, e.g. a script.
+        :param name: string name of locator used to learn timeout
+        :param locate: function given context. Returns element, or
+            None or raises NoSuchElementException if not found yet
+        :param context: element searched from, driver if None
+        :return: element found
+        :raises NoSuchElementException: if element not found in time
+        """
+        context = context or self.driver
+        timeout = self.timeout(name)
+        started = time.time()
+        try:
+            element = WebDriverWait(context, timeout, self._poll_seconds).until(locate)
+        except TimeoutException:
+            # Recorded so learned timeout grows if element got slower
+            self.record(name, time.time() - started)
+            raise NoSuchElementException("{} not found in {:.1f} seconds".format(name, timeout))
+        self.record(name, time.time() - started)
+        return element